@@ -4,23 +4,43 @@ import json
 import string
 import subprocess  # 保留用于其他功能
 import shutil  # 用于复制文件
+import sqlite3  # 用于文件索引
+import threading
+import time
+import select
+import struct
+import queue
+import hashlib
+import codecs
+import math
+import random
+import re
+import bisect
+import heapq
+import fnmatch
+import zipfile
+from xml.etree import ElementTree
+from array import array
+from collections import deque, OrderedDict
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                            QLineEdit, QPushButton, QScrollArea, QLabel, QFileDialog,
                            QColorDialog, QFormLayout, QProgressBar, QComboBox,
                            QStackedWidget, QListWidget, QTreeWidget, QTreeWidgetItem,
-                           QDateTimeEdit, QMessageBox, QFileIconProvider, QGridLayout)
-from PyQt6.QtGui import QPixmap, QColor, QCursor, QIcon
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer, QUrl, QFileInfo, QSize
+                           QDateTimeEdit, QMessageBox, QFileIconProvider,
+                           QSpinBox, QListView, QAbstractItemView, QCheckBox, QTreeView)
+from PyQt6.QtGui import QPixmap, QColor, QCursor, QIcon, QPainter, QFont, QImage, QImageReader
+from PyQt6.QtCore import (Qt, QObject, QThread, pyqtSignal, QTimer, QUrl, QFileInfo, QSize,
+                          QAbstractListModel, QAbstractTableModel, QModelIndex, QRunnable, QThreadPool, QPoint,
+                          QBuffer, QByteArray, QIODevice, QCoreApplication, QFileSystemWatcher)
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtMultimedia import QMediaPlayer
+from PyQt6.QtMultimedia import QMediaPlayer, QVideoSink
 from PyQt6.QtMultimediaWidgets import QVideoWidget
 from PyQt6.QtGui import QDesktopServices
 from PyQt6.QtPdf import QPdfDocument
 from PyQt6.QtPdfWidgets import QPdfView
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import urllib.request
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse, urlsplit, urlunsplit, unquote
 
 # 获取应用程序的基础路径
 def get_base_path():
@@ -70,6 +90,1337 @@ def get_settings_images_path():
 
     return images_dir
 
+# 扫描根目录
+class ScanRoot:
+    """一个扫描根目录及其预算：最大深度、最多文件数和时间预算(秒)，None表示不限制。
+
+    深度从根目录算起，根目录下的直接子目录深度为1。某个根目录的预算用完后只是不再深入，
+    已经列出的内容照常写入索引，其他根目录不受影响。
+    """
+
+    def __init__(self, path, max_depth=None, max_files=None, time_budget=None):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_depth = max_depth
+        self.max_files = max_files
+        self.time_budget = time_budget
+
+    @classmethod
+    def from_settings(cls, item):
+        """settings.json中每个根目录可以是路径字符串，也可以是带预算的字典；没有有效路径时返回None"""
+        if isinstance(item, str):
+            return cls(item) if item.strip() else None
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str) or not item['path'].strip():
+            return None
+        return cls(item['path'], cls.parse_budget(item.get('max_depth'), int),
+                   cls.parse_budget(item.get('max_files'), int), cls.parse_budget(item.get('time_budget'), float))
+
+    @staticmethod
+    def parse_budget(value, kind):
+        """把设置或输入框中的预算转换为kind类型的正数，无法转换或不大于0时视为不限制(None)"""
+        if value is None or isinstance(value, bool):
+            return None
+        try:
+            value = kind(value.strip() if isinstance(value, str) else value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        return value if value > 0 else None
+
+    def to_settings(self):
+        return {'path': self.path, 'max_depth': self.max_depth,
+                'max_files': self.max_files, 'time_budget': self.time_budget}
+
+    def contains(self, path):
+        prefix = self.path.rstrip(os.sep) + os.sep
+        return path == self.path or path.startswith(prefix)
+
+    def depth_of(self, path):
+        relative = os.path.relpath(path, self.path)
+        return 0 if relative == os.curdir else relative.count(os.sep) + 1
+
+    def allows_children(self, depth):
+        """深度为depth的目录是否还可以进入其子目录"""
+        return self.max_depth is None or depth < self.max_depth
+
+# 默认扫描根目录
+def default_scan_roots():
+    """默认扫描用户目录；Windows下再加上系统盘以外的盘符，其他系统再加上/media和/mnt下的挂载"""
+    roots = [ScanRoot('~')]
+    if os.name == 'nt':  # Windows
+        system_drive = os.environ.get('SystemDrive', 'C:').upper()
+        roots.extend(ScanRoot(f'{d}:\\') for d in string.ascii_uppercase
+                     if f'{d}:' != system_drive and os.path.exists(f'{d}:'))
+    else:  # Unix-based systems
+        roots.extend(ScanRoot(path) for path in ('/media', '/mnt') if os.path.isdir(path))
+    return roots
+
+# 去掉重复和嵌套的根目录
+def normalize_scan_roots(roots):
+    """接受ScanRoot或路径，返回不互相包含的ScanRoot列表；嵌套时保留外层根目录"""
+    roots = [root if isinstance(root, ScanRoot) else ScanRoot(root) for root in roots]
+    result = []
+    for root in sorted(roots, key=lambda root: len(root.path)):
+        if not any(outer.contains(root.path) for outer in result):
+            result.append(root)
+    return result
+
+# 获取缩略图缓存目录
+def get_thumbnail_cache_path():
+    """获取磁盘缩略图缓存目录，与设置文件放在同一目录下"""
+    cache_dir = os.path.join(os.path.dirname(get_settings_path()), 'thumbnails')
+    if not os.path.exists(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except Exception:
+            pass
+    return cache_dir
+
+# 获取全文索引数据库路径
+def get_content_index_path():
+    """获取文档全文索引数据库的完整路径，与设置文件放在同一目录"""
+    return os.path.join(os.path.dirname(get_settings_path()), 'content_index.db')
+
+# 获取HTTP缓存目录
+def get_http_cache_path():
+    """获取爬虫HTTP缓存目录，与设置文件放在同一目录下"""
+    cache_dir = os.path.join(os.path.dirname(get_settings_path()), 'http_cache')
+    if not os.path.exists(cache_dir):
+        try:
+            os.makedirs(cache_dir)
+        except Exception:
+            pass
+    return cache_dir
+
+# 获取文件索引数据库路径
+def get_index_path():
+    """获取文件索引数据库的完整路径，与设置文件放在同一目录"""
+    return os.path.join(os.path.dirname(get_settings_path()), 'file_index.db')
+
+# 协作式取消标记
+class CancelToken:
+    """由发起方调用cancel()，所有工作线程在各自的循环中检查。
+
+    实例本身可调用，可以直接作为ParallelWalker.walk等接口的should_stop参数。
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def __call__(self):
+        return self._event.is_set()
+
+# 有界的前K名
+class TopK:
+    """只保留排序键最小的k个条目，内存与匹配总数无关。
+
+    候选先进入缓冲区，攒到2k个时选出前k个并记下第k名的键作为门槛，
+    之后不优于门槛的候选直接丢弃，不再分配和保存。
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.items = []
+        self.bound = None
+        self.count = 0  # 提交过的候选总数
+
+    def offer(self, key, item):
+        """提交一个候选，返回它当前是否可能进入前k名"""
+        self.count += 1
+        if self.bound is not None and not key < self.bound:
+            return False
+        self.items.append((key, item))
+        if len(self.items) >= 2 * self.k:
+            self.items = heapq.nsmallest(self.k, self.items)
+            self.bound = self.items[-1][0]
+        return True
+
+    def result(self):
+        """按排序键从小到大返回前k个条目"""
+        return [item for _key, item in heapq.nsmallest(self.k, self.items)]
+
+# 并行目录遍历引擎
+class ParallelWalker:
+    """用线程池并行列出目录。
+
+    每个工作线程有自己的双端队列，新发现的子目录压入自己的队列尾部（深度优先，局部性好），
+    空闲线程从其他线程队列的头部窃取任务（通常是较大的子树）。
+    scandir/stat在系统调用期间会释放GIL，因此在NVMe和网络挂载上并发列目录能显著缩短总耗时。
+    """
+
+    default_workers = min(32, (os.cpu_count() or 4) * 2)
+
+    def __init__(self, workers=None):
+        self.workers = max(1, workers or self.default_workers)
+
+    def walk(self, items, visit, should_stop=None):
+        """遍历任务并在调用线程中逐个产出结果。
+
+        visit(item)在工作线程中执行，返回(result, child_items)；result不为None时由本生成器产出，
+        child_items会被继续遍历。结果的写入（如数据库）因此都发生在调用线程。
+        """
+        items = list(items)
+        if not items:
+            return
+        deques = [deque() for _ in range(self.workers)]
+        for i, item in enumerate(items):
+            deques[i % self.workers].append(item)
+        state = {'pending': len(items), 'stopped': False}
+        cond = threading.Condition()
+        results = queue.Queue(maxsize=10000)
+        done = object()
+
+        def next_item(local):
+            with cond:
+                while True:
+                    if state['stopped']:
+                        return None
+                    if local:
+                        return local.pop()
+                    for other in deques:
+                        if other:
+                            return other.popleft()
+                    if state['pending'] == 0:
+                        cond.notify_all()
+                        return None
+                    cond.wait(0.1)
+
+        def worker(local):
+            try:
+                while True:
+                    item = next_item(local)
+                    if item is None:
+                        return
+                    children = []
+                    try:
+                        result, children = visit(item)
+                        if result is not None:
+                            results.put(result)
+                    except Exception as e:
+                        print(f"遍历目录时出错: {str(e)}")
+                    finally:
+                        with cond:
+                            local.extend(children)
+                            state['pending'] += len(children) - 1
+                            cond.notify_all()
+            finally:
+                results.put(done)
+
+        threads = [threading.Thread(target=worker, args=(local,), daemon=True) for local in deques]
+        for thread in threads:
+            thread.start()
+        finished = 0
+        try:
+            while finished < len(threads):
+                if should_stop and should_stop():
+                    break
+                try:
+                    result = results.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if result is done:
+                    finished += 1
+                else:
+                    yield result
+        finally:
+            with cond:
+                state['stopped'] = True
+                cond.notify_all()
+            # 排空结果队列，避免工作线程阻塞在put上
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    results.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+
+# 读取挂载表
+def read_mount_table():
+    """返回[(挂载点, 文件系统类型)]，只在Linux上可用，其他系统返回空列表"""
+    mounts = []
+    try:
+        with open('/proc/self/mounts', 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3:
+                    # 挂载点中的空格等字符以八进制转义，如\040
+                    mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+                    mounts.append((mount_point, fields[2]))
+    except OSError:
+        pass
+    return mounts
+
+# 扫描排除规则
+class ScanExclusions:
+    """在进入子目录之前判断是否跳过它，被跳过的目录整棵子树都不会被列出。
+
+    规则依次为：文件系统类型（按挂载表）、只扫描同一设备、隐藏目录、通配符模式。
+    不含路径分隔符的模式匹配目录名（如node_modules），含分隔符的匹配完整路径（如/var/lib/docker）。
+    每条规则分别统计跳过的目录数，可用于检查规则是否过宽或无效。
+    """
+
+    default_patterns = ['/proc', '/sys', '/dev', '/run', '/var/lib/docker', 'node_modules', '__pycache__',
+                        '$Recycle.Bin', 'System Volume Information']
+    # 虚拟文件系统、内存文件系统、网络文件系统和只读镜像
+    default_fs_types = ['proc', 'sysfs', 'devtmpfs', 'devpts', 'tmpfs', 'cgroup', 'cgroup2', 'securityfs',
+                        'debugfs', 'tracefs', 'pstore', 'bpf', 'configfs', 'fusectl', 'mqueue', 'hugetlbfs',
+                        'autofs', 'binfmt_misc', 'efivarfs', 'squashfs', 'nfs', 'nfs4', 'cifs', 'smbfs',
+                        'fuse.sshfs', 'fuse.gvfsd-fuse']
+
+    def __init__(self, patterns=None, fs_types=None, same_device=False, skip_hidden=True):
+        self.patterns = list(self.default_patterns if patterns is None else patterns)
+        self.fs_types = list(self.default_fs_types if fs_types is None else fs_types)
+        self.same_device = same_device
+        self.skip_hidden = skip_hidden
+        flags = re.IGNORECASE if os.name == 'nt' else 0
+        self.name_patterns = [p for p in self.patterns if '/' not in p and '\\' not in p]
+        self.path_patterns = [os.path.normpath(p) for p in self.patterns if '/' in p or '\\' in p]
+        # 每组模式合成一个正则，命中的命名分组对应具体模式
+        self.name_regex = self.compile(self.name_patterns, flags)
+        self.path_regex = self.compile(self.path_patterns, flags)
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.reload_mounts()
+
+    @staticmethod
+    def compile(patterns, flags):
+        if not patterns:
+            return None
+        # 旧版本的fnmatch.translate会生成自己的捕获组，不能按分组序号定位，用命名分组
+        return re.compile('|'.join(f'(?P<p{i}>{fnmatch.translate(p)})' for i, p in enumerate(patterns)), flags)
+
+    @classmethod
+    def from_settings(cls, settings):
+        """类型不对的设置项使用默认值，模式列表中只保留非空字符串"""
+        settings = settings if isinstance(settings, dict) else {}
+
+        def strings(key):
+            value = settings.get(key)
+            return [item for item in value if isinstance(item, str) and item] if isinstance(value, list) else None
+
+        def flag(key, default):
+            value = settings.get(key, default)
+            return value if isinstance(value, bool) else default
+
+        return cls(strings('patterns'), strings('fs_types'), flag('same_device', False), flag('skip_hidden', True))
+
+    def to_settings(self):
+        return {'patterns': self.patterns, 'fs_types': self.fs_types,
+                'same_device': self.same_device, 'skip_hidden': self.skip_hidden}
+
+    def reload_mounts(self):
+        """重新读取挂载表，每次完整扫描前调用"""
+        fs_types = set(self.fs_types)
+        self.excluded_mounts = {mount_point: fs_type for mount_point, fs_type in read_mount_table()
+                                if fs_type in fs_types}
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+        self.reload_mounts()
+
+    def rule_for(self, path, name, entry=None, parent_dev=None):
+        """返回跳过该目录的规则名，不跳过时返回None。entry和parent_dev只在需要stat时使用"""
+        fs_type = self.excluded_mounts.get(path)
+        if fs_type:
+            return f"文件系统 {fs_type}"
+        if self.skip_hidden and self.is_hidden(name, entry):
+            return "隐藏目录"
+        if self.name_regex:
+            match = self.name_regex.match(name)
+            if match:
+                return f"模式 {self.name_patterns[int(match.lastgroup[1:])]}"
+        if self.path_regex:
+            match = self.path_regex.match(path)
+            if match:
+                return f"模式 {self.path_patterns[int(match.lastgroup[1:])]}"
+        if self.same_device and entry is not None and parent_dev is not None:
+            try:
+                if entry.stat(follow_symlinks=False).st_dev != parent_dev:
+                    return "其他设备"
+            except OSError:
+                pass
+        return None
+
+    def prune(self, path, name, entry=None, parent_dev=None):
+        """判断是否跳过目录，跳过时计入对应规则"""
+        rule = self.rule_for(path, name, entry, parent_dev)
+        if rule:
+            with self.lock:
+                self.counts[rule] = self.counts.get(rule, 0) + 1
+        return rule is not None
+
+    @staticmethod
+    def is_hidden(name, entry=None):
+        if name.startswith('.'):
+            return True
+        if os.name == 'nt' and entry is not None:
+            try:
+                # Windows下DirEntry.stat()直接使用目录列表中的属性，不产生额外的系统调用
+                return bool(getattr(entry.stat(follow_symlinks=False), 'st_file_attributes', 0) & 0x2)
+            except OSError:
+                return False
+        return False
+
+    def report(self):
+        """返回按跳过目录数从多到少排序的[(规则, 目录数)]"""
+        with self.lock:
+            return sorted(self.counts.items(), key=lambda item: -item[1])
+
+# 扫描进度估算
+class ScanProgress:
+    """估算目录遍历的进度、速度和剩余时间。
+
+    目录总数取上次建索引时记录的数量（没有记录时对根目录做一次只看第一层的普查），
+    遍历中已发现但尚未列出的目录也计入，两者取大。速度用指数平滑，每interval秒最多回调一次，
+    回调参数为描述当前进度的字典，可以直接通过跨线程信号发送。
+    """
+
+    interval = 0.25  # 秒
+    smoothing = 0.3
+
+    def __init__(self, expected_dirs=None, callback=None):
+        self.expected_dirs = expected_dirs or 0
+        self.callback = callback
+        self.discovered = 0  # 已发现的目录（含根目录）
+        self.dirs_done = 0
+        self.entries = 0  # 已列出的文件和子目录
+        self.bytes = 0
+        self.started = time.monotonic()
+        self.last_emit = 0.0
+        self.last_sample = (self.started, 0, 0)
+        self.entry_rate = 0.0
+        self.dir_rate = 0.0
+        self.percent = 0
+
+    def discover(self, count):
+        self.discovered += count
+
+    def advance(self, entries=0, size=0, children=0):
+        """记录列出了一个目录，children为由它新发现并将要进入的子目录数"""
+        self.dirs_done += 1
+        self.entries += entries
+        self.bytes += size
+        self.discovered += children
+        self.tick()
+
+    def tick(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_emit < self.interval:
+            return
+        last_time, last_entries, last_dirs = self.last_sample
+        elapsed = now - last_time
+        if elapsed > 0:
+            entry_rate = (self.entries - last_entries) / elapsed
+            dir_rate = (self.dirs_done - last_dirs) / elapsed
+            if self.last_emit:
+                entry_rate = self.smoothing * entry_rate + (1 - self.smoothing) * self.entry_rate
+                dir_rate = self.smoothing * dir_rate + (1 - self.smoothing) * self.dir_rate
+            self.entry_rate, self.dir_rate = entry_rate, dir_rate
+            self.last_sample = (now, self.entries, self.dirs_done)
+        self.last_emit = now
+        if self.callback:
+            self.callback(self.snapshot())
+
+    def snapshot(self):
+        total = max(self.expected_dirs, self.discovered, self.dirs_done)
+        remaining = total - self.dirs_done
+        # 新发现的目录会让估算的总数变大，进度条不回退
+        if total:
+            self.percent = max(self.percent, min(99, int(self.dirs_done * 100 / total)))
+        return {
+            'percent': self.percent,
+            'dirs_done': self.dirs_done,
+            'dirs_remaining': remaining,
+            'entries': self.entries,
+            'bytes': self.bytes,
+            'entry_rate': self.entry_rate,
+            'eta': remaining / self.dir_rate if self.dir_rate > 0 else None,
+            'elapsed': time.monotonic() - self.started,
+        }
+
+    @staticmethod
+    def describe(detail):
+        """把snapshot()的结果转换为状态栏文字"""
+        text = (f"已列出 {detail['dirs_done']} 个目录、{detail['entries']} 项（{format_size(detail['bytes'])}），"
+                f"约剩 {detail['dirs_remaining']} 个目录，每秒 {detail['entry_rate']:.0f} 项")
+        if detail['eta'] is not None:
+            text += f"，预计还需 {detail['eta']:.0f} 秒"
+        return text
+
+# SQLite数据库基类
+class SqliteDatabase:
+    """每个线程使用各自的数据库连接（WAL模式），供文件索引和全文索引共用"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+# 磁盘文件索引
+class FileIndex(SqliteDatabase):
+    """基于SQLite的文件索引，记录路径、名称、扩展名、大小和修改时间。
+
+    媒体、文档和文件搜索页面共用同一个索引，首次扫描时建立，之后直接查询索引而不再遍历磁盘。
+    每个线程使用各自的数据库连接。
+    """
+
+    batch_size = 5000
+
+    def __init__(self, db_path=None, workers=None):
+        super().__init__(db_path or get_index_path())
+        self.workers = workers  # 并行遍历的线程数，None表示使用默认值
+        self.exclusions = None  # ScanExclusions，None表示不排除任何目录
+        self.roots = default_scan_roots()  # ScanRoot列表，由设置决定
+        self.changes = 0  # files表每次写入后递增，供内存索引判断是否过期
+        self.build_lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        conn = self.connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                dir TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_ext ON files(ext);
+            CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir);
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs(parent);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        conn.commit()
+
+    def get_meta(self, key, default=None):
+        row = self.connect().execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        conn = self.connect()
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+        conn.commit()
+
+    def is_built(self):
+        return self.get_meta('built_at') is not None
+
+    def file_count(self):
+        return self.connect().execute('SELECT COUNT(*) FROM files').fetchone()[0]
+
+    @staticmethod
+    def make_row(entry, directory):
+        """把os.scandir的条目转换为索引行"""
+        stat = entry.stat(follow_symlinks=False)
+        return (entry.path, entry.name, os.path.splitext(entry.name)[1].lower(),
+                stat.st_size, stat.st_mtime, directory)
+
+    def add_files(self, rows):
+        conn = self.connect()
+        conn.executemany(
+            'INSERT OR REPLACE INTO files (path, name, ext, size, mtime, dir) VALUES (?, ?, ?, ?, ?, ?)',
+            rows)
+        conn.commit()
+        self.changes += 1
+
+    def list_directory(self, directory):
+        """列出一个目录，返回(目录mtime, 文件行列表, 子目录列表)，无法访问时返回None"""
+        exclusions = self.exclusions
+        try:
+            dir_stat = os.stat(directory)
+            dir_mtime = dir_stat.st_mtime
+            rows = []
+            subdirs = []
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            # 在进入子目录之前按排除规则剪枝
+                            if not (exclusions and exclusions.prune(entry.path, entry.name, entry, dir_stat.st_dev)):
+                                subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            rows.append(self.make_row(entry, directory))
+                    except OSError:
+                        continue
+            return dir_mtime, rows, subdirs
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            return None  # 跳过无权限或已消失的目录
+        except OSError as e:
+            print(f"建立索引时出错: {str(e)}")
+            return None
+
+    @staticmethod
+    def root_for(roots, path):
+        """返回roots（已去掉嵌套）中包含path的扫描根目录，不属于任何根目录时返回None"""
+        for root in roots:
+            if root.contains(path):
+                return root
+        return None
+
+    def expected_dirs(self, roots):
+        """估算遍历roots需要列出的目录数：优先用上次建索引时各根目录的目录数，没有记录的根目录只普查第一层"""
+        try:
+            previous = {item['path']: item['dirs'] for item in json.loads(self.get_meta('root_stats', '[]'))}
+        except (ValueError, KeyError, TypeError):
+            previous = {}
+        total = 0
+        for root in roots:
+            if root.path in previous:
+                total += previous[root.path]
+                continue
+            total += 1
+            try:
+                with os.scandir(root.path) as entries:
+                    total += sum(1 for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+        return total
+
+    def build(self, roots, on_batch=None, should_stop=None, on_progress=None):
+        """遍历根目录重建索引。
+
+        roots为ScanRoot或路径列表，每个根目录按自己的深度、文件数和时间预算遍历，
+        各根目录的统计（文件数、目录数、因预算停止的原因）保存在meta表的root_stats中。
+        每写入一批文件就调用on_batch(rows)，便于扫描线程在建索引的同时显示结果。
+        on_progress(detail)定期收到ScanProgress估算的进度。
+        should_stop返回True时中止，未完成的索引不会被标记为已建立。
+        返回是否完整建立。
+        """
+        roots = normalize_scan_roots(roots)
+        conn = self.connect()
+        conn.execute('DELETE FROM files')
+        conn.execute('DELETE FROM dirs')
+        conn.execute("DELETE FROM meta WHERE key = 'built_at'")
+        conn.commit()
+        self.changes += 1
+        if self.exclusions:
+            self.exclusions.reset()
+
+        started = time.monotonic()
+        stats = [{'path': root.path, 'files': 0, 'dirs': 0, 'stopped': None} for root in roots]
+        progress = ScanProgress(self.expected_dirs(roots), on_progress)
+        progress.discover(len(roots))
+
+        def visit(item):
+            directory, parent, root_id, depth = item
+            root = roots[root_id]
+            # 跳过的目录也产出一个空结果，进度才能把它算作已处理
+            if stats[root_id]['stopped']:
+                return (directory, parent, root_id, None, 0), []
+            if root.time_budget is not None and time.monotonic() - started > root.time_budget:
+                stats[root_id]['stopped'] = 'time_budget'
+                return (directory, parent, root_id, None, 0), []
+            listing = self.list_directory(directory)
+            if listing is None:
+                return (directory, parent, root_id, None, 0), []
+            subdirs = listing[2] if root.allows_children(depth) else []
+            return (directory, parent, root_id, listing, len(subdirs)), [(subdir, directory, root_id, depth + 1)
+                                                                         for subdir in subdirs]
+
+        rows = []
+        dir_rows = []
+        walker = ParallelWalker(self.workers)
+        for directory, parent, root_id, listing, queued in walker.walk(
+                [(root.path, None, root_id, 0) for root_id, root in enumerate(roots)], visit, should_stop):
+            if listing is None:
+                progress.advance()
+                continue
+            dir_mtime, file_rows, subdirs = listing
+            progress.advance(len(file_rows) + len(subdirs), sum(row[3] for row in file_rows), queued)
+            root_stats = stats[root_id]
+            max_files = roots[root_id].max_files
+            if max_files is not None and root_stats['files'] + len(file_rows) >= max_files:
+                file_rows = file_rows[:max_files - root_stats['files']]
+                root_stats['stopped'] = 'max_files'
+            root_stats['files'] += len(file_rows)
+            root_stats['dirs'] += 1
+            rows.extend(file_rows)
+            dir_rows.append((directory, parent, dir_mtime))
+
+            if len(rows) >= self.batch_size:
+                self.add_dirs(dir_rows)
+                self.add_files(rows)
+                if on_batch:
+                    on_batch(rows)
+                rows = []
+                dir_rows = []
+
+        if should_stop and should_stop():
+            return False
+        self.add_dirs(dir_rows)
+        if rows:
+            self.add_files(rows)
+            if on_batch:
+                on_batch(rows)
+        if self.exclusions:
+            self.set_meta('prune_stats', json.dumps(self.exclusions.report(), ensure_ascii=False))
+        self.set_meta('root_stats', json.dumps(stats, ensure_ascii=False))
+        self.set_meta('built_at', time.time())
+        return True
+
+    def add_dirs(self, dir_rows):
+        conn = self.connect()
+        conn.executemany('INSERT OR REPLACE INTO dirs (path, parent, mtime) VALUES (?, ?, ?)', dir_rows)
+        conn.commit()
+
+    def remove_subtree(self, directory):
+        """从索引中删除一个目录及其全部子目录，返回被删除文件的路径列表"""
+        conn = self.connect()
+        prefix = directory.rstrip(os.sep) + os.sep
+        where = 'dir = ? OR substr(dir, 1, ?) = ?'
+        params = (directory, len(prefix), prefix)
+        removed = [row[0] for row in conn.execute(f'SELECT path FROM files WHERE {where}', params)]
+        conn.execute(f'DELETE FROM files WHERE {where}', params)
+        conn.execute('DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?', params)
+        conn.commit()
+        if removed:
+            self.changes += 1
+        return removed
+
+    def refresh(self, roots, should_stop=None, recursive=True, on_progress=None):
+        """根据目录mtime增量刷新索引。
+
+        只重新列出mtime发生变化（或新出现）的目录，未变化的目录只做一次stat，
+        不再列出其内容。返回(新增文件行列表, 被删除文件路径列表)。
+        遍历同样遵守各扫描根目录的最大深度和时间预算（时间从本次刷新开始算）。
+        recursive为False时强制重新列出roots中的目录本身，只进入其中新出现的子目录，供文件监视器使用。
+        on_progress(detail)定期收到进度，完整刷新时预计目录数就是索引中已记录的目录数。
+        注意：原地修改文件内容不会改变目录mtime，这类文件的大小和mtime要到下次重建才会更新。
+        """
+        conn = self.connect()
+        exclusions = self.exclusions
+        known = {}
+        children = {}
+        for path, parent, mtime in conn.execute('SELECT path, parent, mtime FROM dirs'):
+            known[path] = mtime
+            children.setdefault(parent, []).append(path)
+        parents = {path: parent for parent, paths in children.items() for path in paths}
+
+        started = time.monotonic()
+        scan_roots = normalize_scan_roots(self.roots)
+        progress = ScanProgress(len(known) if recursive else 0, on_progress)
+
+        # 每个目录都产出一个结果（未变化的目录也是），进度才能逐个计数
+        def visit(item):
+            directory, parent, forced = item
+            root = self.root_for(scan_roots, directory)
+            if root and root.time_budget is not None and time.monotonic() - started > root.time_budget:
+                return ('skipped',), []
+            try:
+                dir_mtime = os.stat(directory).st_mtime
+            except OSError:
+                return ('gone', directory), []
+            if not forced and known.get(directory) == dir_mtime:
+                # 目录本身没有变化，直接进入已记录的子目录；按当前规则应排除的子目录从索引中删除
+                kept = []
+                pruned = []
+                for child in children.get(directory, ()):
+                    if exclusions and exclusions.prune(child, os.path.basename(child)):
+                        pruned.append(child)
+                    else:
+                        kept.append((child, directory, False))
+                return ('same', pruned, len(kept)), kept
+            listing = self.list_directory(directory)
+            if listing is None:
+                return ('skipped',), []
+            if root and not root.allows_children(root.depth_of(directory)):
+                subdirs = []
+            else:
+                subdirs = [subdir for subdir in listing[2] if recursive or subdir not in known]
+            return ('changed', directory, parent, listing, len(subdirs)), [(subdir, directory, False)
+                                                                           for subdir in subdirs]
+
+        added = []
+        removed = []
+        walker = ParallelWalker(self.workers)
+        roots = [root.path if isinstance(root, ScanRoot) else root for root in roots]
+        items = [(root, parents.get(root), not recursive) for root in roots]
+        progress.discover(len(items))
+        for result in walker.walk(items, visit, should_stop):
+            if result[0] == 'skipped':
+                progress.advance()
+                continue
+            if result[0] == 'gone':
+                progress.advance()
+                removed.extend(self.remove_subtree(result[1]))
+                continue
+            if result[0] == 'same':
+                progress.advance(children=result[2])
+                for child in result[1]:
+                    removed.extend(self.remove_subtree(child))
+                continue
+            _, directory, parent, (dir_mtime, file_rows, subdirs), queued = result
+            progress.advance(len(file_rows) + len(subdirs), sum(row[3] for row in file_rows), queued)
+            old_rows = {path: (size, mtime) for path, size, mtime in
+                        conn.execute('SELECT path, size, mtime FROM files WHERE dir = ?', (directory,))}
+            gone = old_rows.keys() - {row[0] for row in file_rows}
+            # 目录mtime变了不代表其中的文件有变化，只写入新增和大小、mtime改变的文件
+            modified = [row for row in file_rows if old_rows.get(row[0]) != (row[3], row[4])]
+            conn.executemany('DELETE FROM files WHERE path = ?', ((path,) for path in gone))
+            conn.executemany(
+                'INSERT OR REPLACE INTO files (path, name, ext, size, mtime, dir) VALUES (?, ?, ?, ?, ?, ?)',
+                modified)
+            removed.extend(gone)
+            added.extend(row for row in modified if row[0] not in old_rows)
+
+            for child in set(children.get(directory, ())) - set(subdirs):
+                removed.extend(self.remove_subtree(child))
+            conn.execute('INSERT OR REPLACE INTO dirs (path, parent, mtime) VALUES (?, ?, ?)',
+                         (directory, parent, dir_mtime))
+            conn.commit()
+            if gone or modified:
+                self.changes += 1
+
+        self.set_meta('refreshed_at', time.time())
+        return added, removed
+
+    def watch_candidates(self, extensions, limit):
+        """返回最值得监视的目录：先是包含指定扩展名文件的目录，其余按路径深度由浅到深补足"""
+        conn = self.connect()
+        placeholders = ', '.join('?' for _ in extensions)
+        result = [row[0] for row in conn.execute(
+            f'SELECT DISTINCT dir FROM files WHERE ext IN ({placeholders}) LIMIT ?', list(extensions) + [limit])]
+        if len(result) < limit:
+            seen = set(result)
+            for (path,) in conn.execute('SELECT path FROM dirs ORDER BY length(path) LIMIT ?', (limit,)):
+                if len(result) >= limit:
+                    break
+                if path not in seen:
+                    result.append(path)
+        return result
+
+    def ensure_built(self, roots, on_batch=None, should_stop=None, rebuild=False, on_progress=None):
+        """索引不存在（或要求重建）时建立索引。
+
+        多个扫描线程同时调用时只有一个会真正遍历磁盘。
+        返回True表示本次调用建立了索引（结果已通过on_batch送出）。
+        """
+        while not self.build_lock.acquire(timeout=0.2):
+            if should_stop and should_stop():
+                return False
+        try:
+            if self.is_built() and not rebuild:
+                return False
+            return self.build(roots, on_batch, should_stop, on_progress)
+        finally:
+            self.build_lock.release()
+
+    def refresh_exclusive(self, roots, should_stop=None, on_progress=None):
+        """等其他线程用完索引后做一次完整增量刷新；在等待中被取消时返回None，否则返回refresh的结果"""
+        while not self.build_lock.acquire(timeout=0.2):
+            if should_stop and should_stop():
+                return None
+        try:
+            return self.refresh(roots, should_stop, on_progress=on_progress)
+        finally:
+            self.build_lock.release()
+
+    def query_by_extensions(self, extensions, limit=None):
+        placeholders = ', '.join('?' for _ in extensions)
+        sql = f'SELECT path, name, ext, size, mtime, dir FROM files WHERE ext IN ({placeholders}) ORDER BY path'
+        params = list(extensions)
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return self.connect().execute(sql, params).fetchall()
+
+_file_index = None
+_file_index_lock = threading.Lock()
+
+# 获取共享的文件索引
+def get_file_index():
+    """获取进程内共享的文件索引实例"""
+    global _file_index
+    with _file_index_lock:
+        if _file_index is None:
+            _file_index = FileIndex()
+        return _file_index
+
+# 通配符转正则
+def glob_to_regex(pattern):
+    """把*、?和[...]通配符转换为只在单个文件名内匹配的正则（不跨越换行）"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '*':
+            parts.append('[^\n]*')
+        elif char == '?':
+            parts.append('[^\n]')
+        elif char == '[':
+            end = pattern.find(']', i + 2 if pattern[i + 1:i + 2] in ('!', ']') else i + 1)
+            if end < 0:
+                parts.append(re.escape(char))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^\n' + body[1:]
+                parts.append('[' + body.replace('\\', '\\\\') + ']')
+                i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return '^' + ''.join(parts) + '$'
+
+# 文件名查询
+class NameQuery:
+    """解析文件搜索框的输入。
+
+    默认按空格拆成多个关键词，文件名须包含全部关键词；含有*、?或[时按通配符匹配整个文件名；
+    以re:开头时按正则表达式搜索。都不区分大小写。
+    """
+
+    def __init__(self, text):
+        text = text.strip()
+        if text.startswith('re:'):
+            self.mode = 'regex'
+            self.pattern = re.compile(text[3:], re.IGNORECASE | re.MULTILINE)
+        elif any(char in text for char in '*?['):
+            self.mode = 'glob'
+            self.pattern = re.compile(glob_to_regex(text.lower()), re.MULTILINE)
+        else:
+            self.mode = 'substring'
+            self.terms = text.lower().split()
+            self.phrase = ' '.join(self.terms)
+            self.scan_term = max(self.terms, key=len) if self.terms else ''  # 用最长的关键词扫描，候选最少
+            self.word_start = re.compile(r'(?:^|[\W_])' + re.escape(self.terms[0])) if self.terms else None
+
+    def find(self, blob, pos):
+        """在换行分隔的小写文件名块中查找下一个候选位置，没有时返回-1"""
+        if self.mode == 'substring':
+            return blob.find(self.scan_term, pos) if self.terms else -1
+        match = self.pattern.search(blob, pos)
+        return match.start() if match else -1
+
+    def matches(self, name):
+        """name为小写文件名"""
+        if self.mode == 'substring':
+            return bool(self.terms) and all(term in name for term in self.terms)
+        return self.pattern.search(name) is not None
+
+    def rank(self, name, mtime=0.0):
+        """排序键，越小越靠前：完全匹配 > 前缀 > 词首 > 其他，同级时最近修改的在前，再按文件名长度"""
+        if self.mode != 'substring':
+            return (0, -mtime, len(name), name)
+        if name == self.phrase or os.path.splitext(name)[0] == self.phrase:
+            level = 0
+        elif name.startswith(self.terms[0]):
+            level = 1
+        elif self.word_start.search(name):
+            level = 2
+        else:
+            level = 3
+        return (level, -mtime, len(name), name)
+
+# 内存文件名索引
+class NameIndex:
+    """把索引中的全部文件名转成小写、用换行连接成一整块文本，搜索时直接在这块文本上查找。
+
+    str.find和正则都在C代码中运行，百万级文件名的一次扫描只需几十毫秒，没有目录深度限制；
+    命中位置用二分查找换算成所在的文件。文件索引有写入后（FileIndex.changes变化），下次搜索前自动重建。
+    """
+
+    def __init__(self, file_index):
+        self.file_index = file_index
+        self.lock = threading.Lock()
+        self.signature = None
+        self.blob = ''
+        self.starts = array('q', [0])  # 每个文件名在blob中的起始位置，末尾是哨兵
+        self.rowids = array('q')
+        self.mtimes = array('d')
+
+    def refresh(self):
+        conn = self.file_index.connect()
+        signature = self.file_index.changes
+        with self.lock:
+            if signature == self.signature:
+                return
+            names = []
+            starts = array('q')
+            rowids = array('q')
+            mtimes = array('d')
+            offset = 0
+            for rowid, name, mtime in conn.execute('SELECT rowid, name, mtime FROM files'):
+                name = name.lower().replace('\n', ' ')
+                names.append(name)
+                starts.append(offset)
+                rowids.append(rowid)
+                mtimes.append(mtime or 0.0)
+                offset += len(name) + 1
+            starts.append(offset)
+            names.append('')
+            self.blob = '\n'.join(names)
+            self.starts = starts
+            self.rowids = rowids
+            self.mtimes = mtimes
+            self.signature = signature
+
+    def search(self, query, limit=None, should_stop=None):
+        """返回(按相关度排序的前limit个[(文件名, 路径)], 匹配总数)"""
+        self.refresh()
+        with self.lock:
+            blob, starts, rowids, mtimes = self.blob, self.starts, self.rowids, self.mtimes
+        top = TopK(limit or len(rowids) or 1)
+        pos = 0
+        while not (should_stop and should_stop()):
+            hit = query.find(blob, pos)
+            if hit < 0:
+                break
+            row = bisect.bisect_right(starts, hit) - 1
+            end = starts[row + 1] - 1
+            name = blob[starts[row]:end]
+            if query.matches(name):
+                top.offer(query.rank(name, mtimes[row]), rowids[row])
+            pos = end + 1  # 每个文件只算一次
+        return self.lookup(top.result()), top.count
+
+    def lookup(self, rowids):
+        conn = self.file_index.connect()
+        found = {}
+        for i in range(0, len(rowids), 500):
+            chunk = rowids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for rowid, name, path in conn.execute(
+                    f'SELECT rowid, name, path FROM files WHERE rowid IN ({placeholders})', chunk):
+                found[rowid] = (name, path)
+        return [found[rowid] for rowid in rowids if rowid in found]
+
+_name_index = None
+_name_index_lock = threading.Lock()
+
+# 获取共享的文件名索引
+def get_name_index():
+    """获取进程内共享的内存文件名索引"""
+    global _name_index
+    with _name_index_lock:
+        if _name_index is None:
+            _name_index = NameIndex(get_file_index())
+        return _name_index
+
+# 下载文件的内容寻址索引
+class ContentStore:
+    """记录下载文件的内容哈希(BLAKE2b) -> 路径，用于发现内容相同的下载。
+
+    表存放在文件索引数据库中并复用文件索引的连接，本地扫描器也可以按哈希查找重复文件。
+    查询时核对文件的大小和修改时间，文件被改动或删除后对应记录自动作废。
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, file_index):
+        self.file_index = file_index
+        self.lock = threading.Lock()  # 保证"查找-保存-登记"不会被其他下载线程打断
+        self._init_db()
+
+    def connect(self):
+        return self.file_index.connect()
+
+    def _init_db(self):
+        conn = self.connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS content_hashes (
+                path TEXT PRIMARY KEY,
+                hash TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                url TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_content_hashes_hash ON content_hashes(hash);
+        """)
+        conn.commit()
+
+    @staticmethod
+    def new_hasher():
+        return hashlib.blake2b(digest_size=32)
+
+    @classmethod
+    def hash_file(cls, path, hasher=None):
+        """把文件内容追加到hasher（默认新建），返回hasher"""
+        hasher = hasher or cls.new_hasher()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(cls.chunk_size), b''):
+                hasher.update(chunk)
+        return hasher
+
+    def find(self, digest, size):
+        """返回内容为digest的现存文件路径，没有时返回None"""
+        conn = self.connect()
+        rows = conn.execute('SELECT path, mtime FROM content_hashes WHERE hash = ? AND size = ?',
+                            (digest, size)).fetchall()
+        for path, mtime in rows:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and stat.st_size == size and stat.st_mtime == mtime:
+                return path
+            conn.execute('DELETE FROM content_hashes WHERE path = ?', (path,))
+        conn.commit()
+        return None
+
+    def add(self, digest, path, url=None):
+        stat = os.stat(path)
+        conn = self.connect()
+        conn.execute('INSERT OR REPLACE INTO content_hashes (path, hash, size, mtime, url) VALUES (?, ?, ?, ?, ?)',
+                     (path, digest, stat.st_size, stat.st_mtime, url))
+        conn.commit()
+
+_content_store = None
+_content_store_lock = threading.Lock()
+
+# 获取共享的内容索引
+def get_content_store():
+    """获取进程内共享的下载内容索引"""
+    global _content_store
+    with _content_store_lock:
+        if _content_store is None:
+            _content_store = ContentStore(get_file_index())
+        return _content_store
+
+# 全文索引支持的文档类型
+CONTENT_EXTENSIONS = ('.pdf', '.docx', '.xlsx', '.pptx')
+
+# Office文档中包含正文的XML部件
+OFFICE_TEXT_PARTS = {
+    '.docx': ('word/document.xml', 'word/header*.xml', 'word/footer*.xml', 'word/footnotes.xml'),
+    '.xlsx': ('xl/sharedStrings.xml', 'xl/worksheets/sheet*.xml'),
+    '.pptx': ('ppt/slides/slide*.xml', 'ppt/notesSlides/notesSlide*.xml'),
+}
+
+MAX_DOCUMENT_CHARS = 1000000  # 每个文档最多索引的字符数
+MAX_XML_PART_BYTES = 64 * 1024 * 1024  # 解压后超过该大小的XML部件视为异常，跳过
+
+# 提取Office文档文本
+def extract_office_text(path, ext):
+    """直接读取docx/xlsx/pptx压缩包中的XML，按段落、共享字符串和行拼接文本"""
+    parts = []
+    length = 0
+    with zipfile.ZipFile(path) as archive:
+        patterns = OFFICE_TEXT_PARTS[ext]
+        members = [info for info in archive.infolist()
+                   if any(fnmatch.fnmatchcase(info.filename, pattern) for pattern in patterns)]
+        # slide2排在slide10之前
+        members.sort(key=lambda info: [int(piece) if piece.isdigit() else piece
+                                       for piece in re.split(r'(\d+)', info.filename)])
+        for info in members:
+            if info.file_size > MAX_XML_PART_BYTES:
+                continue
+            with archive.open(info) as stream:
+                for _event, element in ElementTree.iterparse(stream):
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if tag == 't' and element.text:
+                        parts.append(element.text)
+                        length += len(element.text)
+                    elif tag in ('p', 'si', 'row'):
+                        parts.append('\n')
+                        element.clear()
+                    if length >= MAX_DOCUMENT_CHARS:
+                        return ''.join(parts)
+    return ''.join(parts)
+
+# 提取PDF文本
+def extract_pdf_text(path):
+    document = QPdfDocument(None)
+    try:
+        if document.load(path) != QPdfDocument.Error.None_:
+            return None
+        parts = []
+        length = 0
+        for page in range(document.pageCount()):
+            text = document.getAllText(page).text()
+            parts.append(text)
+            length += len(text)
+            if length >= MAX_DOCUMENT_CHARS:
+                break
+        return '\n'.join(parts)
+    finally:
+        document.close()
+
+# 提取文档文本
+def extract_document_text(path):
+    """返回文档的纯文本，无法读取时返回None"""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext == '.pdf':
+            text = extract_pdf_text(path)
+        elif ext in OFFICE_TEXT_PARTS:
+            text = extract_office_text(path, ext)
+        else:
+            return None
+    except Exception as e:
+        print(f"提取文档文本时出错: {path} - {str(e)}")
+        return None
+    return text[:MAX_DOCUMENT_CHARS] if text else text
+
+CJK_CHARS = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+TOKEN_PATTERN = re.compile(f'([{CJK_CHARS}]+)|[^\\W_{CJK_CHARS}]+')
+
+# 全文索引分词
+def tokenize_for_index(text):
+    """把文本转换为空格分隔的词元：拉丁文字按单词转小写，中日韩文字切成相邻两字的二元组。
+
+    SQLite自带的分词器不能切分中文，预先切成二元组后，任意两字以上的词都能按短语命中。
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        run = match.group(1)
+        if run is None:
+            tokens.append(match.group(0).lower())
+        elif len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return ' '.join(tokens)
+
+# 中日韩文字段末的字
+def cjk_run_ends(text):
+    """返回每段（两字以上）中日韩文字的最后一个字，空格分隔。
+
+    其他字都是某个二元组的开头，单字查询按前缀就能找到；段末的字单独存放在ends列，
+    不混入正文的词元序列，短语查询的相邻关系因此不受影响。
+    """
+    return ' '.join(match.group(1)[-1] for match in TOKEN_PATTERN.finditer(text)
+                    if match.group(1) and len(match.group(1)) > 1)
+
+# 构造全文查询
+def build_match_query(text):
+    """把搜索框输入转换为FTS5查询：每个词变成与索引相同词元组成的短语，所有词都须出现；词尾加*表示前缀匹配"""
+    clauses = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        tokens = tokenize_for_index(word.rstrip('*')).split()
+        if not tokens:
+            continue
+        phrase = '"' + ' '.join(tokens) + '"'
+        if len(tokens) == 1 and len(tokens[0]) == 1 and TOKEN_PATTERN.fullmatch(tokens[0]).group(1):
+            # 单个汉字：在正文中按前缀匹配以它开头的二元组，或者命中ends列中的段末字
+            clauses.append(f'({{name body}} : {phrase} * OR ends : {phrase})')
+            continue
+        if prefix:
+            phrase += ' *'
+        clauses.append(phrase)
+    return ' AND '.join(clauses)
+
+# 文档全文索引
+class ContentIndex(SqliteDatabase):
+    """基于SQLite FTS5的文档全文倒排索引，按BM25排序，文件名的权重高于正文。
+
+    docs表记录每个文档索引时的大小和修改时间，只有新增或改动过的文档才会重新提取文本。
+    每个线程使用各自的数据库连接。
+    """
+
+    schema_version = 3  # 分词方式或表结构改变时递增，旧索引整体重建
+
+    name_weight = 2.0
+    body_weight = 1.0
+
+    def __init__(self, db_path=None):
+        super().__init__(db_path or get_content_index_path())
+        self._init_db()
+
+    def _init_db(self):
+        conn = self.connect()
+        if conn.execute('PRAGMA user_version').fetchone()[0] < self.schema_version:
+            # 旧索引的词元与当前分词方式不一致，清空后由索引线程重新提取
+            conn.executescript("""
+                DROP TABLE IF EXISTS docs;
+                DROP TABLE IF EXISTS doc_text;
+            """)
+            conn.execute(f'PRAGMA user_version = {self.schema_version}')
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                path TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                has_text INTEGER NOT NULL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS doc_text USING fts5(name, body, ends);
+        """)
+        conn.commit()
+
+    def indexed_state(self):
+        """返回{路径: (大小, 修改时间)}"""
+        return {path: (size, mtime) for path, size, mtime in
+                self.connect().execute('SELECT path, size, mtime FROM docs')}
+
+    def document_count(self):
+        return self.connect().execute('SELECT COUNT(*) FROM docs WHERE has_text = 1').fetchone()[0]
+
+    def update(self, row, text):
+        """写入一个文档，row为文件索引中的(path, name, ext, size, mtime, dir)；调用方负责commit"""
+        path, name, _ext, size, mtime, _dir = row
+        conn = self.connect()
+        old = conn.execute('SELECT rowid FROM docs WHERE path = ?', (path,)).fetchone()
+        if old:
+            conn.execute('DELETE FROM doc_text WHERE rowid = ?', old)
+            conn.execute('DELETE FROM docs WHERE rowid = ?', old)
+        cursor = conn.execute('INSERT INTO docs (path, name, size, mtime, has_text) VALUES (?, ?, ?, ?, ?)',
+                              (path, name, size, mtime, 1 if text else 0))
+        if text:
+            # 文本提取失败的文档也登记，文件不变就不再重试
+            conn.execute('INSERT INTO doc_text (rowid, name, body, ends) VALUES (?, ?, ?, ?)',
+                         (cursor.lastrowid, tokenize_for_index(name), tokenize_for_index(text),
+                          cjk_run_ends(name + '\n' + text)))
+
+    def remove(self, paths):
+        conn = self.connect()
+        for path in paths:
+            old = conn.execute('SELECT rowid FROM docs WHERE path = ?', (path,)).fetchone()
+            if old:
+                conn.execute('DELETE FROM doc_text WHERE rowid = ?', old)
+                conn.execute('DELETE FROM docs WHERE rowid = ?', old)
+        conn.commit()
+
+    def commit(self):
+        self.connect().commit()
+
+    def search(self, text, limit=200):
+        """返回按BM25相关度排序的[(文件名, 路径, 得分)]，得分越高越相关"""
+        query = build_match_query(text)
+        if not query:
+            return []
+        rows = self.connect().execute(
+            'SELECT docs.name, docs.path, bm25(doc_text, ?, ?, ?) AS score '
+            'FROM doc_text JOIN docs ON docs.rowid = doc_text.rowid '
+            'WHERE doc_text MATCH ? ORDER BY score LIMIT ?',
+            (self.name_weight, self.body_weight, self.body_weight, query, limit)).fetchall()
+        # FTS5的bm25()越小越相关，取负值便于显示
+        return [(name, path, -score) for name, path, score in rows]
+
+_content_index = None
+_content_index_lock = threading.Lock()
+
+# 获取共享的全文索引
+def get_content_index():
+    """获取进程内共享的文档全文索引"""
+    global _content_index
+    with _content_index_lock:
+        if _content_index is None:
+            _content_index = ContentIndex()
+        return _content_index
+
 # 浏览器检测函数 - 保留但不再用于爬虫
 def detect_browsers():
     """Detect installed browsers and their paths on the system."""
@@ -142,365 +1493,1620 @@ def detect_browsers():
 
     return browsers
 
-# 媒体扫描线程
-class MediaScanner(QThread):
-    file_found = pyqtSignal(str, str, str)  # filename, filepath, type
+# 文件类型扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.mpg', '.mpeg', '.3gp')
+DOCUMENT_EXTENSIONS = {
+    'word': ('.doc', '.docx'),
+    'excel': ('.xls', '.xlsx'),
+    'powerpoint': ('.ppt', '.pptx'),
+    'pdf': ('.pdf',)
+}
+
+# 文件类型 -> 扩展名，以及扫描时使用的扩展名 -> 文件类型查找表
+FILE_CATEGORIES = {'image': IMAGE_EXTENSIONS, 'video': VIDEO_EXTENSIONS, **DOCUMENT_EXTENSIONS}
+EXTENSION_CATEGORIES = {ext: category for category, extensions in FILE_CATEGORIES.items() for ext in extensions}
+
+def classify_file(file_name):
+    """根据扩展名返回文件类型(image/video/word/excel/powerpoint/pdf)，不关心的文件返回None"""
+    return EXTENSION_CATEGORIES.get(os.path.splitext(file_name)[1].lower())
+
+# 扫描结果批量发送
+class ResultBatcher:
+    """把逐个产生的结果攒成一批，再通过一个跨线程信号发送。
+
+    攒满max_items个或距第一个未发送结果超过max_delay秒时发送，避免每个文件一次排队调用淹没GUI线程。
+    """
+
+    def __init__(self, signal, max_items=200, max_delay=0.05):
+        self.signal = signal
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self.items = []
+        self.first_at = 0.0
+
+    def add(self, item):
+        if not self.items:
+            self.first_at = time.monotonic()
+        self.items.append(item)
+        if len(self.items) >= self.max_items:
+            self.flush()
+        else:
+            self.tick()
+
+    def tick(self):
+        """超过max_delay时发送已攒下的结果"""
+        if self.items and time.monotonic() - self.first_at >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        if self.items:
+            self.signal.emit(self.items)
+            self.items = []
+
+# 统一文件扫描线程
+class FileScanner(QThread):
+    """一次遍历同时为媒体和文档页面分类文件。
+
+    首次扫描时建立文件索引并在遍历过程中送出结果，之后先送出索引中已有的结果，
+    再按需增量刷新索引，把新增和消失的文件分别通过files_found和files_removed推送。
+    页面使用虚拟化的列表视图，因此默认不限制结果数量。
+    """
+    files_found = pyqtSignal(list)  # [(filename, filepath, type), ...]
+    files_removed = pyqtSignal(list)  # [filepath, ...]
     scan_complete = pyqtSignal()
     progress_signal = pyqtSignal(int)
+    progress_detail = pyqtSignal(dict)  # ScanProgress.snapshot()
 
-    def __init__(self, media_type='all'):
+    def __init__(self, categories=None, refresh=False, rebuild=False):
         super().__init__()
-        self.image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
-        self.video_extensions = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v', '.mpg', '.mpeg', '.3gp')
-        self.max_files = 1000
-        self.scanned_files = 0
+        self.categories = tuple(categories or FILE_CATEGORIES)
+        self.max_files = None  # 每种类型最多送出的文件数，None表示不限制
+        self.category_counts = dict.fromkeys(self.categories, 0)
         self.is_scanning = False
-        self.media_type = media_type
+        self.refresh = refresh  # 增量刷新索引中有变化的目录
+        self.rebuild = rebuild  # 丢弃索引，完整重新遍历
+
+    @property
+    def scanned_files(self):
+        return sum(self.category_counts.values())
 
     def run(self):
         self.is_scanning = True
-        self.scanned_files = 0
-        for drive in self.get_available_drives():
-            self.scan_directory(drive)
-            if self.scanned_files >= self.max_files:
-                break
-            self.progress_signal.emit(int(self.scanned_files / self.max_files * 100))
+        self.category_counts = dict.fromkeys(self.categories, 0)
+        self.batcher = ResultBatcher(self.files_found)
+        index = get_file_index()
+        # 首次扫描时建立索引，并在建索引的过程中直接送出匹配的文件
+        built_now = index.ensure_built(index.roots, self.emit_matches,
+                                       self.isInterruptionRequested, self.rebuild, self.report_progress)
+        if not built_now:
+            for category in self.categories:
+                if self.isInterruptionRequested():
+                    break
+                self.emit_matches(index.query_by_extensions(FILE_CATEGORIES[category], self.max_files))
+            if self.refresh and not self.isInterruptionRequested():
+                self.refresh_index(index)
+        self.progress_signal.emit(100)
         self.is_scanning = False
         self.scan_complete.emit()
 
-    def get_available_drives(self):
-        if os.name == 'nt':  # Windows
-            import string
-            return [f'{d}:\\' for d in string.ascii_uppercase if os.path.exists(f'{d}:')]
-        else:  # Unix-based systems
-            return ['/']
-
-    def scan_directory(self, directory):
+    def refresh_index(self, index):
+        """页面已显示索引中的结果后再刷新索引，只推送变化的部分"""
         try:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    if self.scanned_files >= self.max_files:
-                        return
-                    lower_file = file.lower()
-                    if self.media_type in ['all', 'image'] and lower_file.endswith(self.image_extensions):
-                        self.file_found.emit(file, os.path.join(root, file), 'image')
-                        self.scanned_files += 1
-                    elif self.media_type in ['all', 'video'] and lower_file.endswith(self.video_extensions):
-                        self.file_found.emit(file, os.path.join(root, file), 'video')
-                        self.scanned_files += 1
-            if self.scanned_files >= self.max_files:
-                return
-        except PermissionError:
-            pass  # Skip directories we don't have permission to access
-        except Exception as e:
-            print(f"扫描目录时出错: {str(e)}")
-
-# 文档扫描线程
-class DocumentScanner(QThread):
-    file_found = pyqtSignal(str, str, str)  # filename, filepath, type
+            changes = index.refresh_exclusive(index.roots, self.isInterruptionRequested, self.report_progress)
+        except sqlite3.Error as e:
+            print(f"刷新文件索引时出错: {str(e)}")
+            return
+        if changes is None:
+            return
+        added, removed = changes
+        removed = [path for path in removed if classify_file(os.path.basename(path)) in self.categories]
+        if removed:
+            self.files_removed.emit(removed)
+        self.emit_matches(added)
+
+    def report_progress(self, detail):
+        self.progress_signal.emit(detail['percent'])
+        self.progress_detail.emit(detail)
+
+    def emit_matches(self, rows):
+        for path, name, ext in (row[:3] for row in rows):
+            if self.isInterruptionRequested():
+                break
+            category = EXTENSION_CATEGORIES.get(ext)
+            if category not in self.category_counts:
+                continue
+            if self.max_files is not None and self.category_counts[category] >= self.max_files:
+                continue
+            self.category_counts[category] += 1
+            self.batcher.add((name, path, category))
+        self.batcher.flush()
+
+# 扫描结果分发
+class ScanCoordinator(QObject):
+    """持有唯一的FileScanner，把扫描结果和文件监视线程推送的变化分发给所有订阅的页面"""
+    scan_started = pyqtSignal()
+    files_found = pyqtSignal(list)  # [(filename, filepath, type), ...]
+    files_removed = pyqtSignal(list)  # [filepath, ...]
     scan_complete = pyqtSignal()
     progress_signal = pyqtSignal(int)
+    progress_detail = pyqtSignal(dict)
 
     def __init__(self):
         super().__init__()
-        self.document_extensions = {
-            'word': ('.doc', '.docx'),
-            'excel': ('.xls', '.xlsx'),
-            'powerpoint': ('.ppt', '.pptx'),
-            'pdf': ('.pdf',)
-        }
-        self.max_files = 1000
-        self.scanned_files = 0
-        self.is_scanning = False
+        self.scanner = None
+        self.has_scanned = False
+
+    def is_scanning(self):
+        return self.scanner is not None and self.scanner.isRunning()
+
+    def ensure_scanned(self):
+        """首次需要结果时扫描一次，之后的变化由文件监视线程推送"""
+        if not self.has_scanned:
+            self.start_scan()
+
+    def start_scan(self, rebuild=False):
+        self.has_scanned = True
+        self.stop()
+        self.scan_started.emit()
+        self.scanner = FileScanner(refresh=True, rebuild=rebuild)
+        self.scanner.files_found.connect(self.files_found)
+        self.scanner.files_removed.connect(self.files_removed)
+        self.scanner.scan_complete.connect(self.scan_complete)
+        self.scanner.progress_signal.connect(self.progress_signal)
+        self.scanner.progress_detail.connect(self.progress_detail)
+        self.scanner.start()
 
-    def run(self):
-        self.is_scanning = True
-        self.scanned_files = 0
-        for drive in self.get_available_drives():
-            self.scan_directory(drive)
-            if self.scanned_files >= self.max_files:
-                break
-            self.progress_signal.emit(int(self.scanned_files / self.max_files * 100))
-        self.is_scanning = False
-        self.scan_complete.emit()
+    def stop(self):
+        if self.is_scanning():
+            self.scanner.requestInterruption()
+            self.scanner.wait()
 
-    def get_available_drives(self):
-        if os.name == 'nt':  # Windows
-            import string
-            return [f'{d}:\\' for d in string.ascii_uppercase if os.path.exists(f'{d}:')]
-        else:  # Unix-based systems
-            return ['/']
+_scan_coordinator = None
 
-    def scan_directory(self, directory):
-        try:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    if self.scanned_files >= self.max_files:
-                        return
-                    lower_file = file.lower()
-                    for doc_type, extensions in self.document_extensions.items():
-                        if lower_file.endswith(extensions):
-                            self.file_found.emit(file, os.path.join(root, file), doc_type)
-                            self.scanned_files += 1
-                            break
-            if self.scanned_files >= self.max_files:
-                return
-        except PermissionError:
-            pass  # Skip directories we don't have permission to access
-        except Exception as e:
-            print(f"扫描文档时出错: {str(e)}")
+# 获取共享的扫描结果分发器
+def get_scan_coordinator():
+    """获取进程内共享的扫描结果分发器，只能在GUI线程中调用"""
+    global _scan_coordinator
+    if _scan_coordinator is None:
+        _scan_coordinator = ScanCoordinator()
+    return _scan_coordinator
+
+# 文档全文索引线程
+class ContentIndexer(QThread):
+    """对照文件索引增量更新全文索引：删除已不存在的文档，并行提取新增和改动文档的文本后写入。"""
+    progress_signal = pyqtSignal(int, int)  # 已处理, 总数
+    indexing_complete = pyqtSignal(int, int)  # 更新的文档数, 删除的文档数
+
+    commit_interval = 1.0  # 秒
+
+    def run(self):
+        index = get_content_index()
+        file_index = get_file_index()
+        current = {row[0]: row for row in file_index.query_by_extensions(CONTENT_EXTENSIONS)}
+        state = index.indexed_state()
+        removed = [path for path in state if path not in current]
+        index.remove(removed)
+        pending = [row for path, row in current.items() if state.get(path) != (row[3], row[4])]
+
+        # 文本提取在线程池中并行进行，写入都在本线程
+        walker = ParallelWalker(max(2, (os.cpu_count() or 4) // 2))
+        done = 0
+        last_commit = time.monotonic()
+        self.progress_signal.emit(0, len(pending))
+        for row, text in walker.walk(pending, lambda row: ((row, extract_document_text(row[0])), []),
+                                     self.isInterruptionRequested):
+            index.update(row, text)
+            done += 1
+            now = time.monotonic()
+            if now - last_commit >= self.commit_interval:
+                index.commit()
+                last_commit = now
+                self.progress_signal.emit(done, len(pending))
+        index.commit()
+        self.progress_signal.emit(done, len(pending))
+        self.indexing_complete.emit(done, len(removed))
 
 # 文件搜索线程
 class FileSearchThread(QThread):
-    update_signal = pyqtSignal(str, str)
+    """搜索文件名，只保留最相关的max_results个结果。
+
+    有索引时在内存文件名索引中一次查出排好序的结果；没有索引时并行遍历磁盘，
+    边找边通过update_signal推送，遍历结束后再用results_ranked推送排好序的最终结果。
+    取消通过CancelToken传给所有工作线程。
+    """
+    update_signal = pyqtSignal(list)  # 遍历中陆续找到的[(filename, filepath), ...]
+    results_ranked = pyqtSignal(list)  # 按相关度排好序的最终结果，替换之前推送的内容
     progress_signal = pyqtSignal(int)
     finished_signal = pyqtSignal()
 
+    max_results = 5000
+
     def __init__(self, filename):
         super().__init__()
         self.filename = filename
-        self.is_cancelled = False
+        self.cancel_token = CancelToken()
+        self.match_count = 0
+        self.elapsed = 0.0
+        self.error = None
 
     def run(self):
-        available_drives = [f"{d}:\\" for d in string.ascii_uppercase if os.path.exists(f"{d}:")]
-        total_drives = len(available_drives)
-
-        for i, drive in enumerate(available_drives):
-            if self.is_cancelled:
-                break
-            self.search_directory(drive, max_depth=5)  # Limit search depth to 5 levels
-            self.progress_signal.emit(int((i + 1) / total_drives * 100))
+        started = time.monotonic()
+        try:
+            query = NameQuery(self.filename)
+        except re.error as e:
+            self.error = f"正则表达式无效: {str(e)}"
+            self.finished_signal.emit()
+            return
 
+        index = get_file_index()
+        if index.is_built():
+            # 已有索引时在内存文件名索引中查找，结果按相关度排序
+            results, self.match_count = get_name_index().search(query, self.max_results, self.cancel_token)
+        else:
+            results = self.walk_roots(query)
+        self.results_ranked.emit(results)
+        self.elapsed = time.monotonic() - started
+        self.progress_signal.emit(100)
         self.finished_signal.emit()
 
-    def search_directory(self, directory, current_depth=0, max_depth=5):
-        if self.is_cancelled or current_depth > max_depth:
-            return
-
+    def walk_roots(self, query):
+        """没有索引时按设置中的扫描根目录及其深度和时间预算遍历，返回排好序的前max_results个结果"""
+        index = get_file_index()
+        roots = normalize_scan_roots(index.roots)
+        started = time.monotonic()
+
+        def visit(item):
+            directory, root, depth = item
+            if root.time_budget is not None and time.monotonic() - started > root.time_budget:
+                return None, []
+            matches, subdirs = self.search_directory(directory, query)
+            if not root.allows_children(depth):
+                subdirs = []
+            # 没有匹配的目录也产出空列表，让本线程有机会按时间发送攒下的结果
+            return matches or [], [(subdir, root, depth + 1) for subdir in subdirs]
+
+        # 所有根目录由线程池并行列出，结果在本线程排名和发送
+        batcher = ResultBatcher(self.update_signal)
+        top = TopK(self.max_results)
+        shown = 0
+        walker = ParallelWalker(index.workers)
+        for matches in walker.walk([(root.path, root, 0) for root in roots], visit, self.cancel_token):
+            for key, match in matches:
+                if top.offer(key, match) and shown < self.max_results:
+                    shown += 1
+                    batcher.add(match)
+            batcher.tick()
+        batcher.flush()
+        self.match_count = top.count
+        return top.result()
+
+    def search_directory(self, directory, query):
+        """列出单个目录，返回([(排序键, (文件名, 路径))], 需要继续搜索的子目录)"""
+        matches = []
+        subdirs = []
+        exclusions = get_file_index().exclusions
         try:
-            for entry in os.scandir(directory):
-                if self.is_cancelled:
-                    return
-                if entry.is_file() and self.filename.lower() in entry.name.lower():
-                    self.update_signal.emit(entry.name, entry.path)
-                elif entry.is_dir():
-                    self.search_directory(entry.path, current_depth + 1, max_depth)
+            dir_dev = os.stat(directory).st_dev if exclusions and exclusions.same_device else None
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if self.cancel_token.cancelled:
+                        break
+                    name = entry.name.lower()
+                    if entry.is_dir(follow_symlinks=False):
+                        if not (exclusions and exclusions.prune(entry.path, entry.name, entry, dir_dev)):
+                            subdirs.append(entry.path)
+                    elif entry.is_file() and query.matches(name):
+                        try:
+                            mtime = entry.stat().st_mtime
+                        except OSError:
+                            mtime = 0.0
+                        matches.append((query.rank(name, mtime), (entry.name, entry.path)))
         except PermissionError:
             pass  # Skip directories we don't have permission to access
         except Exception as e:
             print(f"搜索文件时出错: {str(e)}")
+        return (matches or None), subdirs
 
     def cancel(self):
-        self.is_cancelled = True
+        self.cancel_token.cancel()
+
+# Linux inotify 封装
+class InotifyWatcher:
+    """通过ctypes调用Linux的inotify监视目录变化，当前系统不支持时create()返回None"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+                  IN_DELETE | IN_DELETE_SELF | IN_ONLYDIR)
+
+    @classmethod
+    def create(cls):
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(cls.IN_NONBLOCK | cls.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def __init__(self, libc, fd):
+        self.libc = libc
+        self.fd = fd
+        self.paths = {}  # watch descriptor -> 目录
+        self.watches = {}  # 目录 -> watch descriptor
+
+    @staticmethod
+    def max_watches():
+        try:
+            with open('/proc/sys/fs/inotify/max_user_watches') as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return 8192
+
+    def add_watch(self, path):
+        if path in self.watches:
+            return True
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            return False
+        self.paths[wd] = path
+        self.watches[path] = wd
+        return True
+
+    def read_events(self, timeout):
+        """最多等待timeout秒，返回[(目录, 文件名, mask)]"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + 16 <= len(data):
+            wd, mask, _cookie, length = struct.unpack_from('iIII', data, offset)
+            name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+            offset += 16 + length
+            if mask & self.IN_IGNORED:
+                # 目录已被删除或移走，内核自动移除了监视
+                path = self.paths.pop(wd, None)
+                if path is not None:
+                    self.watches.pop(path, None)
+                continue
+            directory = self.paths.get(wd)
+            if directory is not None:
+                events.append((directory, os.fsdecode(name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+# 文件监视线程
+class FileWatcher(QThread):
+    """监视文件的新建、重命名和删除，并把变化同步到文件索引和页面。
+
+    Linux下对一部分目录使用inotify（优先监视包含媒体和文档的目录），其他系统用QFileSystemWatcher
+    监视数量有限的一批同类目录。未被监视的目录通过定期按目录mtime增量刷新索引来发现变化，
+    完整刷新要stat索引中的每个目录，所以间隔较长。
+    """
+    files_found = pyqtSignal(list)  # [(filename, filepath, type), ...]
+    files_removed = pyqtSignal(list)  # [filepath, ...]
+
+    poll_interval = 1800  # 没有inotify时的完整刷新间隔(秒)
+    inotify_poll_interval = 3600  # 有inotify时仍定期轮询，覆盖未被监视的目录
+    debounce = 0.5  # 合并短时间内的连续事件
+    max_inotify_watches = 100000
+    max_native_watches = 1000  # QFileSystemWatcher在Windows和macOS上每个目录占用一个句柄或描述符
+
+    def __init__(self, roots=None):
+        super().__init__()
+        self.roots = roots
+
+    def run(self):
+        index = get_file_index()
+        roots = self.roots or [root.path for root in index.roots]
+
+        # 等待首次扫描建立索引
+        while not index.is_built():
+            if self.isInterruptionRequested():
+                return
+            self.msleep(1000)
+
+        inotify = InotifyWatcher.create()
+        if inotify:
+            budget = min(self.max_inotify_watches, inotify.max_watches() // 2)
+            for directory in index.watch_candidates(tuple(EXTENSION_CATEGORIES), budget):
+                if self.isInterruptionRequested():
+                    break
+                inotify.add_watch(directory)
+            interval = self.inotify_poll_interval
+        else:
+            interval = self.poll_interval
+
+        # 没有inotify时用Qt的原生监视（Windows的ReadDirectoryChangesW、macOS的FSEvents等），
+        # 监视器属于本线程，事件在下面的循环中处理
+        watcher = None
+        changed = []
+        if not inotify:
+            watcher = QFileSystemWatcher()
+            watcher.directoryChanged.connect(changed.append)
+            directories = index.watch_candidates(tuple(EXTENSION_CATEGORIES), self.max_native_watches)
+            if directories:
+                watcher.addPaths(directories)
+
+        next_poll = time.monotonic() + interval
+        dirty = set()
+        dirty_since = None
+        try:
+            while not self.isInterruptionRequested():
+                if inotify:
+                    for directory, name, mask in inotify.read_events(0.2):
+                        dirty.add(directory)
+                        if dirty_since is None:
+                            dirty_since = time.monotonic()
+                        if mask & InotifyWatcher.IN_ISDIR and mask & (InotifyWatcher.IN_CREATE |
+                                                                      InotifyWatcher.IN_MOVED_TO):
+                            path = os.path.join(directory, name)
+                            # 新建的目录如果会被扫描排除，也不必监视
+                            if not (index.exclusions and index.exclusions.rule_for(path, name)):
+                                inotify.add_watch(path)
+                else:
+                    self.msleep(200)
+                    QCoreApplication.processEvents()
+                    if changed:
+                        dirty.update(changed)
+                        changed.clear()
+                        if dirty_since is None:
+                            dirty_since = time.monotonic()
+
+                now = time.monotonic()
+                if dirty and now - dirty_since >= self.debounce:
+                    if self.apply_refresh(index, sorted(dirty), recursive=False):
+                        dirty.clear()
+                        dirty_since = None
+                if now >= next_poll:
+                    if self.apply_refresh(index, roots, recursive=True):
+                        next_poll = now + interval
+        finally:
+            if inotify:
+                inotify.close()
+            else:
+                watcher.deleteLater()
+
+    def apply_refresh(self, index, directories, recursive):
+        """刷新索引并推送变化；扫描线程正在使用索引时返回False，留到下一轮"""
+        if not index.build_lock.acquire(blocking=False):
+            return False
+        try:
+            added, removed = index.refresh(directories, self.isInterruptionRequested, recursive)
+        except sqlite3.Error as e:
+            print(f"刷新文件索引时出错: {str(e)}")
+            return True
+        finally:
+            index.build_lock.release()
+
+        removed = [path for path in removed if classify_file(os.path.basename(path))]
+        if removed:
+            self.files_removed.emit(removed)
+        found = [(row[1], row[0], EXTENSION_CATEGORIES[row[2]]) for row in added if row[2] in EXTENSION_CATEGORIES]
+        if found:
+            self.files_found.emit(found)
+        return True
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# 规范化URL
+def normalize_url(url):
+    """返回用于去重的规范URL：去掉片段，协议和主机转小写，去掉默认端口，查询参数排序"""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, parts.query, ''))
+    host = parts.hostname or ''
+    netloc = f"[{host}]" if ':' in host else host
+    if port is not None and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    query = '&'.join(sorted(pair for pair in parts.query.split('&') if pair))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+# 布隆过滤器
+class BloomFilter:
+    """内存固定的近似集合，用于多页面爬取时的URL去重。
+
+    按预计元素数capacity和误判率error_rate计算位数和哈希次数，
+    不会漏判已加入的元素，只会以约error_rate的概率把新元素误判为已存在。
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item):
+        # 双重哈希：由一个摘要的两半生成hash_count个位置
+        digest = hashlib.blake2b(item.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(item))
+
+    def add(self, item):
+        for pos in self.positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+# 流式网页资源提取
+class PageExtractor(HTMLParser):
+    """单遍流式提取网页中的图片、视频和链接。
+
+    分块调用feed()即可，不构建文档树；每发现一个资源就回调on_resource(url, 类型)。
+    <base href>会改变其后相对URL的基准。整页没有任何标签资源时，
+    close()退回到用正则匹配正文中出现的URL。
+    """
+    video_hosts = ('youtube.com', 'vimeo.com', 'youku.com', 'bilibili.com')
+    css_url_pattern = re.compile(r'url\(\s*[\'"]?([^\'")]*?)[\'"]?\s*\)')
+    bare_url_pattern = re.compile(r'https?://[^\s<>"\']+')
+    url_delimiters = frozenset(' \t\r\n<>"\'')
+    max_fallback_tail = 8192
+
+    def __init__(self, page_url, on_resource):
+        super().__init__(convert_charrefs=True)
+        self.base_url = page_url
+        self.on_resource = on_resource
+        self.found = 0
+        self.title = None
+        self.text_tag = None  # 正在收集文本的title或style标签
+        self.text_parts = []
+        self.fallback_urls = {}  # 备用方法找到的URL，按出现顺序去重
+        self.fallback_tail = ''
+
+    def emit(self, url, file_type, resolve=True):
+        url = url.strip()
+        if url:
+            self.found += 1
+            # 处理相对URL
+            self.on_resource(urljoin(self.base_url, url) if resolve else url, file_type)
+
+    def feed(self, data):
+        if not self.found:
+            self.scan_bare_urls(data)
+        super().feed(data)
+
+    def close(self):
+        super().close()
+        if not self.found:
+            # 备用方法：直接提取所有URL
+            self.scan_bare_urls('', final=True)
+            for url in self.fallback_urls:
+                # 简单判断URL类型
+                lower = url.lower()
+                if lower.endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')):
+                    self.on_resource(url, 'image')
+                elif lower.endswith(('.mp4', '.webm', '.avi', '.mov')):
+                    self.on_resource(url, 'video')
+                else:
+                    self.on_resource(url, 'link')
+        self.fallback_urls = {}
+
+    def scan_bare_urls(self, data, final=False):
+        # 块末尾可能截断URL，未遇到分隔符的部分留到下一块再匹配
+        buffer = self.fallback_tail + data
+        end = len(buffer)
+        if not final:
+            limit = max(0, end - self.max_fallback_tail)
+            while end > limit and buffer[end - 1] not in self.url_delimiters:
+                end -= 1
+        self.fallback_tail = buffer[end:]
+        for url in self.bare_url_pattern.findall(buffer, 0, end):
+            self.fallback_urls[url] = None
+
+    def scan_css(self, css):
+        for url in self.css_url_pattern.findall(css):
+            if url and not url.startswith('data:'):
+                self.emit(url, 'image')
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        # 元素内联样式中的背景图片
+        style = attrs.get('style')
+        if style:
+            self.scan_css(style)
+
+        if tag == 'img':
+            src = attrs.get('src') or attrs.get('data-src') or attrs.get('data-original')
+            if src:
+                self.emit(src, 'image')
+        elif tag in ('video', 'source'):
+            src = attrs.get('src')
+            if src:
+                self.emit(src, 'video')
+        elif tag == 'iframe':
+            # 嵌入视频(YouTube, Vimeo等)
+            src = attrs.get('src')
+            if src and any(host in src for host in self.video_hosts):
+                self.emit(src, 'video', resolve=False)
+        elif tag == 'a':
+            href = attrs.get('href')
+            if href and not href.startswith(('javascript:', '#', 'mailto:')):
+                self.emit(href, 'link')
+        elif tag == 'base':
+            href = attrs.get('href')
+            if href:
+                self.base_url = urljoin(self.base_url, href)
+        elif tag in ('title', 'style'):
+            self.text_tag = tag
+            self.text_parts = []
+
+    def handle_data(self, data):
+        if self.text_tag:
+            self.text_parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != self.text_tag:
+            return
+        text = ''.join(self.text_parts)
+        if tag == 'title':
+            if self.title is None:
+                self.title = text.strip()
+        else:
+            # <style>标签内的背景图片
+            self.scan_css(text)
+        self.text_tag = None
+        self.text_parts = []
+
+# 多页面爬取队列
+class CrawlFrontier:
+    """多页面爬取的URL队列。
+
+    每个主机一个先进先出队列（同一主机内按层次广度优先），取任务时在主机之间轮转，
+    跳过并发已满或仍在礼貌间隔内的主机。深度、页数上限和范围过滤都在入队时检查，
+    因此队列中的每个URL都一定会被抓取。
+    """
+
+    def __init__(self, seed_url, max_depth=1, max_pages=100, same_domain=True, scope_pattern=None,
+                 per_host_limit=2, delay=0.5):
+        self.max_depth = max_depth
+        self.max_pages = max(1, max_pages)
+        self.same_domain = same_domain
+        self.scope = re.compile(scope_pattern) if scope_pattern else None
+        self.per_host_limit = max(1, per_host_limit)
+        self.delay = max(0.0, delay)
+        seed_host = self.host_of(seed_url)
+        self.seed_domain = seed_host[4:] if seed_host.startswith('www.') else seed_host
+        self.queues = OrderedDict()  # 主机 -> deque[(url, depth)]
+        self.active = {}  # 主机 -> 正在抓取的页面数
+        self.next_time = {}  # 主机 -> 允许发出下一个请求的时间
+        self.seen = set()  # 已入队页面的规范URL，数量不超过max_pages
+        self.scheduled = 0
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.add(seed_url, 0)
+
+    @staticmethod
+    def host_of(url):
+        return (urlparse(url).hostname or '').lower()
+
+    def in_scope(self, url):
+        if not url.startswith(('http://', 'https://')):
+            return False
+        if self.same_domain:
+            host = self.host_of(url)
+            if host != self.seed_domain and not host.endswith('.' + self.seed_domain):
+                return False
+        return self.scope is None or self.scope.search(url) is not None
+
+    def add(self, url, depth):
+        """加入待抓取页面，超出限制、超出范围或已见过时返回False；起始页面不受范围过滤限制"""
+        key = normalize_url(url)
+        with self.cond:
+            if depth > self.max_depth or self.scheduled >= self.max_pages or key in self.seen:
+                return False
+            if depth > 0 and not self.in_scope(url):
+                return False
+            self.seen.add(key)
+            self.scheduled += 1
+            self.queues.setdefault(self.host_of(url), deque()).append((url, depth))
+            self.cond.notify_all()
+            return True
+
+    def next(self, should_stop):
+        """取出下一个可以抓取的(url, depth)；全部完成或已停止时返回None"""
+        with self.cond:
+            while not should_stop():
+                now = time.monotonic()
+                wait = 0.1
+                for host, items in self.queues.items():
+                    if not items or self.active.get(host, 0) >= self.per_host_limit:
+                        continue
+                    ready = self.next_time.get(host, 0)
+                    if ready > now:
+                        wait = min(wait, ready - now)
+                        continue
+                    self.queues.move_to_end(host)  # 下次优先考虑其他主机
+                    self.active[host] = self.active.get(host, 0) + 1
+                    self.next_time[host] = now + self.delay
+                    self.in_flight += 1
+                    return items.popleft()
+                if self.in_flight == 0 and not any(self.queues.values()):
+                    self.cond.notify_all()
+                    return None
+                self.cond.wait(wait)
+            return None
+
+    def done(self, url):
+        host = self.host_of(url)
+        with self.cond:
+            self.active[host] -= 1
+            self.in_flight -= 1
+            self.cond.notify_all()
 
 # 爬虫线程 - 无浏览器依赖版本
 # 增强版爬虫线程
 class CrawlerThread(QThread):
+    """爬取网页中的图片、视频和链接。
+
+    max_depth为0时只爬取给定页面；大于0时沿同一范围内的链接继续爬取，
+    由workers个工作线程共用一个带连接池的会话，按CrawlFrontier的每主机并发和间隔限制抓取。
+    每个资源按规范URL只发出一次：单页面用精确集合去重，多页面用内存固定的布隆过滤器。
+    """
     update_signal = pyqtSignal(str, str)
     status_signal = pyqtSignal(str)
     progress_signal = pyqtSignal(int)
     debug_signal = pyqtSignal(str)  # 新增调试信号
 
-    def __init__(self, url, browser=None, browser_path=None):
+    # 使用更健壮的请求头
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Cache-Control': 'max-age=0',
+        'DNT': '1',
+    }
+    page_timeout = (10, 30)  # 多页面爬取时的(连接, 读取)超时
+    status_interval = 1.0  # 多页面爬取时状态消息的最小间隔(秒)
+    resources_per_page = 200  # 估算布隆过滤器容量时每个页面的资源数
+    bloom_error_rate = 0.001
+
+    def __init__(self, url, browser=None, browser_path=None, max_depth=0, max_pages=100,
+                 same_domain=True, scope_pattern=None, per_host_limit=2, delay=0.5, workers=8):
         QThread.__init__(self)
         self.url = url
         # 保留browser和browser_path参数以保持接口兼容性，但不再使用它们
         self.browser = browser
         self.browser_path = browser_path
         self.found_items = 0  # 跟踪找到的项目数量
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.same_domain = same_domain
+        self.scope_pattern = scope_pattern
+        self.per_host_limit = per_host_limit
+        self.delay = delay
+        self.workers = max(1, workers)
+        self.session = None
+        if max_depth > 0:
+            self.seen = BloomFilter(max(10000, max_pages * self.resources_per_page), self.bloom_error_rate)
+        else:
+            self.seen = set()
 
     def run(self):
         try:
-            self.status_signal.emit("开始访问页面...")
-            self.debug_signal.emit(f"正在请求URL: {self.url}")
-
-            # 使用更健壮的请求头
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Cache-Control': 'max-age=0',
-                'DNT': '1',
-            }
-
-            self.status_signal.emit("正在发送HTTP请求...")
-
             # 增加超时和重试机制
-            session = requests.Session()
-            adapter = requests.adapters.HTTPAdapter(max_retries=3)
-            session.mount('http://', adapter)
-            session.mount('https://', adapter)
+            self.session = create_http_session(self.workers)
+            if self.max_depth > 0:
+                self.crawl_site()
+            else:
+                self.crawl_page()
 
-            response = session.get(self.url, headers=headers, timeout=30)
+            if self.isInterruptionRequested():
+                self.status_signal.emit("爬取已停止")
+            else:
+                self.status_signal.emit(f"爬取完成，共找到 {self.found_items} 个项目")
 
+        except re.error as e:
+            self.status_signal.emit(f"范围正则表达式无效: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            self.status_signal.emit(f"请求错误: {str(e)}")
+            self.debug_signal.emit(f"请求异常详情: {str(e)}")
+        except Exception as e:
+            self.status_signal.emit(f"爬取失败: {str(e)}")
+            self.debug_signal.emit(f"异常详情: {str(e)}")
+            import traceback
+            self.debug_signal.emit(f"异常堆栈: {traceback.format_exc()}")
+
+    def crawl_page(self):
+        """只爬取起始页面，边下载边解析，资源一经发现立即发出"""
+        self.status_signal.emit("开始访问页面...")
+        self.debug_signal.emit(f"正在请求URL: {self.url}")
+        self.status_signal.emit("正在发送HTTP请求...")
+
+        cache = get_http_cache()
+        cached = cache.get(self.url, 'page')
+        headers = dict(self.headers, **cache.conditional_headers(cached))
+        with self.session.get(self.url, headers=headers, timeout=30, stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                meta = cached[0]
+                self.status_signal.emit("页面未修改，使用缓存的解析结果")
+                for url, file_type in meta['resources']:
+                    self.emit_resource(url, file_type)
+                self.progress_signal.emit(100)
+                self.status_signal.emit(f"正在爬取: {meta.get('title') or '无标题'}")
+                return
             if response.status_code != 200:
                 self.status_signal.emit(f"HTTP请求失败，状态码: {response.status_code}")
                 self.debug_signal.emit(f"请求失败，响应内容: {response.text[:500]}...")
                 return
 
-            # 尝试检测编码
-            if response.encoding == 'ISO-8859-1':
-                # 尝试更准确地检测编码
-                encodings = requests.utils.get_encodings_from_content(response.text)
-                if encodings:
-                    response.encoding = encodings[0]
-                else:
-                    response.encoding = response.apparent_encoding
+            self.status_signal.emit("网页已连接，开始边下载边解析...")
+            total = int(response.headers.get('Content-Length') or 0)
 
-            self.status_signal.emit("网页加载完成，开始解析...")
-            self.debug_signal.emit(f"使用编码: {response.encoding}, 内容长度: {len(response.text)}")
+            def report_progress():
+                # Content-Length是传输字节数，进度按已从连接读取的字节计算
+                if total:
+                    self.progress_signal.emit(min(100, int(response.raw.tell() / total * 100)))
 
-            # 使用BeautifulSoup解析HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
+            resources = []
 
-            # 提取元信息
-            title = soup.title.string if soup.title else "无标题"
-            self.status_signal.emit(f"正在爬取: {title}")
+            def on_resource(url, file_type):
+                resources.append((url, file_type))
+                self.emit_resource(url, file_type)
 
-            # 提取图片
-            self.status_signal.emit("正在提取图片...")
-            images = soup.find_all('img')
-            total_images = len(images)
-            self.debug_signal.emit(f"找到 {total_images} 个图片标签")
+            extractor, length = self.extract_resources(response, on_resource, report_progress)
+            self.debug_signal.emit(f"使用编码: {response.encoding}, 内容长度: {length}")
+            if not self.isInterruptionRequested():
+                cache.put(self.url, 'page', response, resources=resources, title=extractor.title)
 
-            for i, img in enumerate(images):
-                if self.isInterruptionRequested():
-                    break
+        self.progress_signal.emit(100)
+        self.status_signal.emit(f"正在爬取: {extractor.title or '无标题'}")
 
-                src = img.get('src') or img.get('data-src') or img.get('data-original')
-                if src:
-                    # 处理相对URL
-                    full_url = urljoin(self.url, src)
-                    self.debug_signal.emit(f"处理图片: {full_url}")
-                    self.update_signal.emit(full_url, 'image')
-                    self.found_items += 1
+    def crawl_site(self):
+        """从起始页面出发，沿范围内的链接爬取最多max_pages个页面"""
+        frontier = CrawlFrontier(self.url, self.max_depth, self.max_pages, self.same_domain,
+                                 self.scope_pattern, self.per_host_limit, self.delay)
+        self.status_signal.emit(f"开始多页面爬取: 深度 {self.max_depth}，最多 {frontier.max_pages} 个页面")
+        results = queue.Queue()
+        done = object()
 
-                # 更新进度
-                self.progress_signal.emit(int((i+1) / max(total_images, 1) * 100))
+        def worker():
+            try:
+                while True:
+                    item = frontier.next(self.isInterruptionRequested)
+                    if item is None:
+                        return
+                    url, depth = item
+                    try:
+                        resources = self.fetch_page(url)
+                        if depth < self.max_depth:
+                            for link, file_type in resources:
+                                if file_type == 'link' and self.is_crawlable(link):
+                                    frontier.add(link, depth + 1)
+                        results.put((url, resources, None))
+                    except Exception as e:
+                        results.put((url, [], str(e)))
+                    finally:
+                        # 子链接先入队再标记完成，避免队列被误判为已空
+                        frontier.done(url)
+            finally:
+                results.put(done)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        finished = 0
+        pages = 0
+        last_status = 0
+        # 结果在本线程中发出；停止时不等待正在进行的请求，工作线程完成当前页面后自行退出
+        while finished < len(threads) and not self.isInterruptionRequested():
+            try:
+                item = results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is done:
+                finished += 1
+                continue
+            url, resources, error = item
+            pages += 1
+            if error:
+                self.debug_signal.emit(f"页面抓取失败: {url} - {error}")
+            for resource_url, file_type in resources:
+                self.emit_resource(resource_url, file_type)
+            self.progress_signal.emit(int(pages / max(frontier.scheduled, 1) * 100))
+            now = time.monotonic()
+            if now - last_status >= self.status_interval:
+                last_status = now
+                self.status_signal.emit(f"已爬取 {pages}/{frontier.scheduled} 个页面: {url}")
+
+    def emit_resource(self, url, file_type):
+        """发出尚未发出过的资源"""
+        key = normalize_url(url)
+        if key in self.seen:
+            return
+        self.seen.add(key)
+        self.update_signal.emit(url, file_type)
+        self.found_items += 1
+
+    def fetch_page(self, url):
+        """抓取一个页面并返回其中的(url, 类型)列表；非HTML内容返回空列表，未修改时返回缓存的结果"""
+        resources = []
+        cache = get_http_cache()
+        cached = cache.get(url, 'page')
+        headers = dict(self.headers, **cache.conditional_headers(cached))
+        with self.session.get(url, headers=headers, timeout=self.page_timeout,
+                              stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                return [tuple(resource) for resource in cached[0]['resources']]
+            if response.status_code != 200:
+                raise requests.exceptions.RequestException(f"HTTP {response.status_code}")
+            content_type = response.headers.get('Content-Type', '').lower()
+            if content_type and 'html' not in content_type:
+                return resources
+            extractor, _length = self.extract_resources(response, lambda resource_url, file_type:
+                                                        resources.append((resource_url, file_type)))
+            if not self.isInterruptionRequested():
+                cache.put(url, 'page', response, resources=resources, title=extractor.title)
+        return resources
+
+    @staticmethod
+    def is_crawlable(url):
+        """跳过明显指向媒体或文档文件的链接，它们不会包含更多链接"""
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        return ext not in EXTENSION_CATEGORIES
+
+    def iter_text(self, response, chunk_size=64 * 1024):
+        """边下载边解码响应正文。
+
+        响应头没有声明编码时，先查页面首块中的charset声明，再按首块内容推测。
+        """
+        chunks = response.iter_content(chunk_size)
+        first = next(chunks, b'')
+        encoding = response.encoding
+        if not encoding or encoding.upper() == 'ISO-8859-1':
+            # 尝试更准确地检测编码
+            declared = requests.utils.get_encodings_from_content(first.decode('ascii', 'replace'))
+            if declared:
+                encoding = declared[0]
+            else:
+                encoding = requests.compat.chardet.detect(first).get('encoding') or 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            encoding = 'utf-8'
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        response.encoding = encoding
+        yield decoder.decode(first)
+        for chunk in chunks:
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
+
+    def extract_resources(self, response, on_resource, on_chunk=None):
+        """流式解析响应正文，每发现一个资源回调on_resource(url, 类型)；返回(提取器, 正文字符数)"""
+        extractor = PageExtractor(response.url, on_resource)
+        length = 0
+        for text in self.iter_text(response):
+            if self.isInterruptionRequested():
+                break
+            extractor.feed(text)
+            length += len(text)
+            if on_chunk:
+                on_chunk()
+        extractor.close()
+        return extractor, length
+
+# 创建带连接池的HTTP会话
+def create_http_session(pool_size=10, retries=3):
+    """创建requests会话，同一主机的连接会被复用；多个线程可共用同一个会话"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                            max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# 网络图片预览下载任务
+class PreviewFetchTask(QRunnable):
+    def __init__(self, fetcher, url, generation):
+        super().__init__()
+        self.setAutoDelete(False)  # 由ImagePreviewFetcher持有，便于从队列中取消
+        self.fetcher = fetcher
+        self.url = url
+        self.generation = generation
+        self.cancelled = False
 
-            # 提取视频
-            self.status_signal.emit("正在提取视频...")
-            videos = soup.find_all(['video', 'iframe'])
-            self.debug_signal.emit(f"找到 {len(videos)} 个视频标签")
+    def run(self):
+        if self.cancelled:
+            return
+        image = QImage()
+        error = ""
+        try:
+            data = self.download()
+            if data is None:
+                return
+            buffer = QBuffer()
+            buffer.setData(QByteArray(data))
+            buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+            reader = QImageReader(buffer)
+            reader.setAutoTransform(True)
+            source_size = reader.size()
+            if source_size.isValid():
+                reader.setScaledSize(source_size.scaled(self.fetcher.width, self.fetcher.height,
+                                                        Qt.AspectRatioMode.KeepAspectRatio))
+            image = reader.read()
+            if image.isNull():
+                error = "图片加载失败"
+        except Exception as e:
+            error = f"错误: {str(e)[:20]}"
+        if not self.cancelled:
+            self.fetcher.task_done.emit(self.generation, self.url, image, error)
+
+    def download(self):
+        """分块读取响应体，取消后立即放弃连接；返回None表示已取消。图片未修改时使用HTTP缓存中的正文"""
+        fetcher = self.fetcher
+        cache = get_http_cache()
+        cached = cache.get(self.url, 'image')
+        headers = dict(fetcher.headers, **cache.conditional_headers(cached))
+        with fetcher.session.get(self.url, headers=headers, timeout=fetcher.timeout,
+                                 stream=True) as response:
+            if response.status_code == 304 and cached is not None:
+                return cached[1]
+            if response.status_code != 200:
+                raise requests.RequestException(f"HTTP {response.status_code}")
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(64 * 1024):
+                if self.cancelled:
+                    return None
+                chunks.append(chunk)
+                received += len(chunk)
+                if received > fetcher.max_bytes:
+                    raise requests.RequestException("图片过大")
+            data = b"".join(chunks)
+            cache.put(self.url, 'image', response, data)
+            return data
+
+# 爬虫结果的图片预览加载器
+class ImagePreviewFetcher(QObject):
+    """在线程池中并发下载并解码爬取到的图片，结果通过preview_ready/preview_failed发回GUI线程。
+
+    所有任务共用一个带连接池的requests会话。同一URL只下载一次；
+    cancel_all()撤销队列中的任务，并丢弃正在下载的任务的结果。
+    """
+    preview_ready = pyqtSignal(str, QPixmap)
+    preview_failed = pyqtSignal(str, str)
+    task_done = pyqtSignal(int, str, QImage, str)
+
+    max_concurrency = 6
+    timeout = 5
+    max_bytes = 20 * 1024 * 1024
+
+    def __init__(self, width=100, height=60, parent=None):
+        super().__init__(parent)
+        self.width = width
+        self.height = height
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'image/avif,image/webp,image/*,*/*;q=0.8',
+        }
+        self.session = create_http_session(self.max_concurrency, retries=1)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.max_concurrency)
+        self.pending = {}  # URL -> PreviewFetchTask
+        self.generation = 0
+        self.task_done.connect(self._on_task_done)
+
+    def request(self, url):
+        cached = get_pixmap_cache().get(url, self.width, self.height)
+        if cached is not None:
+            self.preview_ready.emit(url, cached)
+            return
+        if url in self.pending:
+            return
+        task = PreviewFetchTask(self, url, self.generation)
+        self.pending[url] = task
+        self.pool.start(task)
+
+    def cancel_all(self):
+        self.generation += 1
+        for task in self.pending.values():
+            task.cancelled = True
+            self.pool.tryTake(task)
+        self.pending.clear()
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.waitForDone(self.timeout * 1000)
+        self.session.close()
+
+    def _on_task_done(self, generation, url, image, error):
+        if generation != self.generation:
+            return
+        self.pending.pop(url, None)
+        if image.isNull():
+            self.preview_failed.emit(url, error or "图片加载失败")
+            return
+        pixmap = QPixmap.fromImage(image)
+        get_pixmap_cache().put(url, self.width, self.height, pixmap)
+        self.preview_ready.emit(url, pixmap)
+
+# 格式化文件大小
+def format_size(size):
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024.0:
+            return f"{size:.2f} {unit}"
+        size /= 1024.0
+    return f"{size:.2f} PB"
+
+# 解析Content-Range中的总大小
+def parse_content_range_total(value):
+    """从'bytes 0-99/1000'或'bytes */1000'中取出总大小，未知时返回0"""
+    if value and '/' in value:
+        total = value.rsplit('/', 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    return 0
+
+# 单个文件的下载任务
+class DownloadTask(QRunnable):
+    def __init__(self, manager, task_id, url, path):
+        super().__init__()
+        self.setAutoDelete(False)  # 由DownloadManager持有，便于从队列中取消
+        self.manager = manager
+        self.task_id = task_id
+        self.url = url
+        self.path = path
+        self.part_path = path + '.part'
+        self.meta_path = path + '.part.json'
+        self.cancelled = False
+        self.started = False
+        self.received = 0
+        self.total = 0
+        self.speed = 0.0
+        self.last_report = 0
+        self.last_received = 0
+        self.last_save = 0
+        self.lock = threading.Lock()  # 分段下载时保护进度和断点记录
+        self.hasher = None  # 单连接下载时边下载边计算的内容哈希
+        self.duplicate_of = None
+        self.result = "完成"
 
-            for video in videos:
-                if self.isInterruptionRequested():
+    def run(self):
+        self.started = True
+        manager = self.manager
+        for attempt in range(manager.max_retries + 1):
+            if self.cancelled:
+                break
+            try:
+                self.transfer()
+                if self.cancelled:
                     break
-
-                # 处理video标签
-                if video.name == 'video':
-                    src = video.get('src')
-                    if src:
-                        full_url = urljoin(self.url, src)
-                        self.debug_signal.emit(f"处理视频: {full_url}")
-                        self.update_signal.emit(full_url, 'video')
-                        self.found_items += 1
-
-                # 处理iframe嵌入视频(YouTube, Vimeo等)
-                elif video.name == 'iframe':
-                    src = video.get('src')
-                    if src and ('youtube.com' in src or 'vimeo.com' in src or 'youku.com' in src or 'bilibili.com' in src):
-                        self.debug_signal.emit(f"处理嵌入视频: {src}")
-                        self.update_signal.emit(src, 'video')
-                        self.found_items += 1
-
-            # 提取视频源
-            video_sources = soup.find_all('source')
-            self.debug_signal.emit(f"找到 {len(video_sources)} 个视频源标签")
-
-            for source in video_sources:
-                if self.isInterruptionRequested():
+                manager.task_finished.emit(self.task_id, True, self.result)
+                return
+            except Exception as e:
+                if self.cancelled:
                     break
+                if attempt >= manager.max_retries or not self.is_retryable(e):
+                    manager.task_finished.emit(self.task_id, False, f"下载失败: {str(e)[:80]}")
+                    return
+                # 指数退避，加少量随机抖动避免多个任务同时重试
+                delay = manager.backoff_base * (2 ** attempt) * random.uniform(0.8, 1.2)
+                manager.task_status.emit(self.task_id, f"{delay:.0f}秒后重试 ({attempt + 1}/{manager.max_retries})")
+                deadline = time.monotonic() + delay
+                while not self.cancelled and time.monotonic() < deadline:
+                    time.sleep(0.1)
+        manager.task_finished.emit(self.task_id, False, "已取消")
+
+    @staticmethod
+    def is_retryable(error):
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            status = error.response.status_code
+            return status >= 500 or status in (408, 429)
+        return isinstance(error, requests.exceptions.RequestException)
+
+    @staticmethod
+    def read_meta(path):
+        """读取保存路径为path的未完成下载的记录"""
+        try:
+            with open(path + '.part.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_meta(self, meta):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    @staticmethod
+    def if_range_validator(meta):
+        """返回可用于If-Range的验证器：强ETag优先，其次Last-Modified，都没有时返回None。
+
+        弱ETag(W/"...")不能用于If-Range，服务器会一律返回完整的200响应。
+        """
+        etag = meta.get('etag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return meta.get('last_modified')
+
+    def make_meta(self, response):
+        return {
+            'url': self.url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
 
-                src = source.get('src')
-                if src:
-                    full_url = urljoin(self.url, src)
-                    self.debug_signal.emit(f"处理视频源: {full_url}")
-                    self.update_signal.emit(full_url, 'video')
-                    self.found_items += 1
-
-            # 提取链接
-            if not self.isInterruptionRequested():
-                self.status_signal.emit("正在提取链接...")
-                links = soup.find_all('a')
-                total_links = len(links)
-                self.debug_signal.emit(f"找到 {total_links} 个链接标签")
-
-                for i, link in enumerate(links):
-                    if self.isInterruptionRequested():
-                        break
-
-                    href = link.get('href')
-                    if href and not href.startswith(('javascript:', '#', 'mailto:')):
-                        full_url = urljoin(self.url, href)
-                        self.debug_signal.emit(f"处理链接: {full_url}")
-                        self.update_signal.emit(full_url, 'link')
-                        self.found_items += 1
-
-                    # 更新进度
-                    self.progress_signal.emit(int((i+1) / max(total_links, 1) * 100))
-
-            # 尝试提取CSS背景图片
-            self.status_signal.emit("正在提取CSS背景图片...")
-            style_tags = soup.find_all('style')
-            inline_styles = []
-
-            # 提取内联样式标签内容
-            for style in style_tags:
-                if style.string:
-                    inline_styles.append(style.string)
-
-            # 提取元素内联样式
-            elements_with_style = soup.find_all(lambda tag: tag.has_attr('style'))
-            for element in elements_with_style:
-                inline_styles.append(element['style'])
-
-            # 简单解析内联样式中的URL
-            import re
-            url_pattern = re.compile(r'url$$[\'"]?(.*?)[\'"]?$$')
-            for style in inline_styles:
-                urls = url_pattern.findall(style)
-                for url in urls:
-                    if url and not url.startswith('data:'):
-                        full_url = urljoin(self.url, url)
-                        self.debug_signal.emit(f"处理CSS背景图片: {full_url}")
-                        self.update_signal.emit(full_url, 'image')
-                        self.found_items += 1
-
-            # 检查是否找到任何内容
-            if self.found_items == 0:
-                self.debug_signal.emit("未找到任何可爬取内容，尝试使用备用方法...")
-
-                # 备用方法：直接提取所有URL
-                all_urls = re.findall(r'https?://[^\s<>"\']+', response.text)
-                for url in all_urls:
-                    # 简单判断URL类型
-                    if any(url.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.gif', '.webp']):
-                        self.update_signal.emit(url, 'image')
-                        self.found_items += 1
-                    elif any(url.lower().endswith(ext) for ext in ['.mp4', '.webm', '.avi', '.mov']):
-                        self.update_signal.emit(url, 'video')
-                        self.found_items += 1
-                    else:
-                        self.update_signal.emit(url, 'link')
-                        self.found_items += 1
+    def transfer(self):
+        """大文件且服务器支持Range时分段并行下载，否则单连接下载；两种方式都能从断点继续"""
+        meta = self.read_meta(self.path) if os.path.exists(self.part_path) else {}
+        if not meta:
+            # 没有记录的.part无法确认内容来源，从头下载
+            if os.path.exists(self.part_path):
+                os.remove(self.part_path)
+            meta = self.plan_segments()
+        if meta.get('segments'):
+            self.transfer_segments(meta)
+        else:
+            self.transfer_stream()
 
-            if self.isInterruptionRequested():
-                self.status_signal.emit("爬取已停止")
+    def plan_segments(self):
+        """用HEAD请求查询大小和Accept-Ranges，适合分段时预分配.part文件并返回分段记录，否则返回{}"""
+        manager = self.manager
+        try:
+            response = manager.session.head(self.url, headers=manager.headers, timeout=manager.timeout,
+                                            allow_redirects=True)
+        except requests.exceptions.RequestException:
+            return {}
+        total = int(response.headers.get('Content-Length') or 0)
+        if (response.status_code != 200 or total < manager.segment_threshold
+                or response.headers.get('Accept-Ranges', '').lower() != 'bytes'):
+            return {}
+        count = min(manager.max_segments, total // manager.min_segment_size)
+        if count < 2:
+            return {}
+        size = total // count
+        meta = self.make_meta(response)
+        meta['total'] = total
+        # 每段为[起始字节, 结束字节(含), 已下载字节]
+        meta['segments'] = [[i * size, (total if i == count - 1 else (i + 1) * size) - 1, 0]
+                            for i in range(count)]
+        with open(self.part_path, 'wb') as f:
+            try:
+                os.posix_fallocate(f.fileno(), 0, total)
+            except (AttributeError, OSError):
+                f.truncate(total)  # 不支持fallocate时退回稀疏文件
+        self.save_meta(meta)
+        return meta
+
+    def transfer_segments(self, meta):
+        manager = self.manager
+        segments = meta['segments']
+        validator = self.if_range_validator(meta)
+        self.hasher = None  # 各段乱序写入，完成后再计算哈希
+        self.total = meta['total']
+        self.received = sum(segment[2] for segment in segments)
+        self.last_report = self.last_save = time.monotonic()
+        self.last_received = self.received
+        errors = []  # 某一段失败不影响其他段，重试时只补下载未完成的部分
+        changed = threading.Event()
+
+        def fetch(segment):
+            try:
+                start, end = segment[0], segment[1]
+                headers = dict(manager.headers, Range=f"bytes={start + segment[2]}-{end}")
+                if validator:
+                    headers['If-Range'] = validator
+                with manager.session.get(self.url, headers=headers, timeout=manager.timeout,
+                                         stream=True) as response:
+                    if response.status_code == 200 and validator:
+                        changed.set()  # If-Range不匹配，服务器上的文件已变化
+                        return
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise requests.exceptions.ConnectionError(f"服务器未返回分段内容 ({response.status_code})")
+                    # 无缓冲写入，保证断点记录中的字节都已写入文件
+                    with open(self.part_path, 'r+b', buffering=0) as f:
+                        f.seek(start + segment[2])
+                        for chunk in response.iter_content(manager.chunk_size):
+                            if self.cancelled or changed.is_set():
+                                return
+                            chunk = chunk[:end + 1 - start - segment[2]]
+                            f.write(chunk)
+                            with self.lock:
+                                segment[2] += len(chunk)
+                                self.received += len(chunk)
+                            self.report()
+                            self.checkpoint(meta)
+                if start + segment[2] <= end:
+                    raise requests.exceptions.ConnectionError(f"分段 {start}-{end} 连接中断")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=fetch, args=(segment,), daemon=True)
+                   for segment in segments if segment[0] + segment[2] <= segment[1]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if changed.is_set():
+            for path in (self.part_path, self.meta_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise requests.exceptions.ConnectionError("服务器上的文件已变化，将重新下载")
+        with self.lock:
+            self.save_meta(meta)
+        if self.cancelled:
+            return
+        if errors:
+            raise errors[0]
+        self.complete()
+
+    def checkpoint(self, meta):
+        """每秒最多保存一次分段进度，中断后据此续传"""
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_save < 1.0:
+                return
+            self.last_save = now
+            self.save_meta(meta)
+
+    def transfer_stream(self):
+        """单连接下载到.part文件，已有部分内容时用Range续传；If-Range保证服务器文件变化后从头下载"""
+        manager = self.manager
+        offset = os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+        headers = dict(manager.headers)
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+            meta = self.read_meta(self.path)
+            validator = self.if_range_validator(meta)
+            if validator:
+                headers['If-Range'] = validator
+        self.last_report = time.monotonic()
+        self.last_received = offset
+        self.hasher = None
+        with manager.session.get(self.url, headers=headers, timeout=manager.timeout,
+                                 stream=True) as response:
+            if response.status_code == 416 and offset:
+                # .part已经是完整文件，或者服务器上的文件变短了
+                if parse_content_range_total(response.headers.get('Content-Range')) == offset:
+                    self.received = self.total = offset
+                    self.complete()
+                    return
+                os.remove(self.part_path)
+                raise requests.exceptions.ConnectionError("续传位置无效，将重新下载")
+            response.raise_for_status()
+            if response.status_code == 206 and offset:
+                mode = 'ab'
+                self.total = parse_content_range_total(response.headers.get('Content-Range'))
+                # 续传时先把已有部分计入哈希
+                self.hasher = ContentStore.hash_file(self.part_path)
             else:
-                self.status_signal.emit(f"爬取完成，共找到 {self.found_items} 个项目")
-
-        except requests.exceptions.RequestException as e:
-            self.status_signal.emit(f"请求错误: {str(e)}")
-            self.debug_signal.emit(f"请求异常详情: {str(e)}")
-        except Exception as e:
-            self.status_signal.emit(f"爬取失败: {str(e)}")
-            self.debug_signal.emit(f"异常详情: {str(e)}")
-            import traceback
-            self.debug_signal.emit(f"异常堆栈: {traceback.format_exc()}")
+                # 服务器不支持续传或文件已变化，从头下载
+                offset = 0
+                mode = 'wb'
+                self.total = int(response.headers.get('Content-Length') or 0)
+                self.save_meta(self.make_meta(response))
+                self.hasher = ContentStore.new_hasher()
+            self.received = offset
+            with open(self.part_path, mode) as f:
+                for chunk in response.iter_content(manager.chunk_size):
+                    if self.cancelled:
+                        return
+                    f.write(chunk)
+                    self.hasher.update(chunk)
+                    self.received += len(chunk)
+                    self.report()
+        if self.total and self.received < self.total:
+            raise requests.exceptions.ConnectionError(f"连接中断，已下载 {self.received}/{self.total} 字节")
+        self.complete()
+
+    def complete(self):
+        """计算内容哈希并保存文件；内容与已下载的文件相同时按dedup_mode硬链接或跳过"""
+        store = get_content_store()
+        # 单连接下载边下载边计算哈希，分段下载和直接完成的情况在这里读取整个文件
+        hasher = self.hasher or store.hash_file(self.part_path)
+        digest = hasher.hexdigest()
+        size = os.path.getsize(self.part_path)
+        with store.lock:
+            existing = store.find(digest, size)
+            if existing is None:
+                os.replace(self.part_path, self.path)
+                store.add(digest, self.path, self.url)
+            else:
+                os.remove(self.part_path)
+                linked = False
+                if self.manager.dedup_mode == 'hardlink':
+                    try:
+                        os.link(existing, self.path)
+                        linked = True
+                    except OSError:
+                        pass  # 跨文件系统或不支持硬链接时退回跳过
+                self.duplicate_of = existing
+                self.result = "重复文件，已硬链接" if linked else "重复文件，已跳过"
+        try:
+            os.remove(self.meta_path)
+        except OSError:
+            pass
+        self.report(force=True)
+        if self.duplicate_of:
+            self.manager.task_deduplicated.emit(self.task_id, self.duplicate_of)
+
+    def report(self, force=False):
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.last_report
+            if not force and elapsed < self.manager.report_interval:
+                return
+            if elapsed > 0:
+                instant = (self.received - self.last_received) / elapsed
+                # 指数平滑，避免速度显示跳动
+                self.speed = instant if not self.speed else self.speed * 0.7 + instant * 0.3
+            self.last_report = now
+            self.last_received = self.received
+            received, total, speed = self.received, self.total, self.speed
+        self.manager.task_progress.emit(self.task_id, received, total, speed)
+
+# 下载管理器
+class DownloadManager(QObject):
+    """在有限大小的线程池中并行下载文件，所有任务共用一个带连接池的会话。
+
+    数据先写入目标旁的.part文件（.part.json记录URL和校验信息），中断后用Range请求续传，
+    网络错误和5xx响应按指数退避重试。服务器声明Accept-Ranges的大文件拆成max_segments段，
+    用多个连接并行写入预分配的.part文件。同一URL只下载一次，文件名冲突时自动加数字后缀。
+    下载完成后按内容哈希查ContentStore，与已有文件内容相同时硬链接到已有文件(dedup_mode为'hardlink')
+    或直接丢弃('skip')。
+    """
+    task_added = pyqtSignal(int, str, str)  # 任务ID, URL, 保存路径
+    task_progress = pyqtSignal(int, 'qint64', 'qint64', float)  # 任务ID, 已下载字节, 总字节, 速度
+    task_status = pyqtSignal(int, str)
+    task_finished = pyqtSignal(int, bool, str)  # 任务ID, 是否成功, 结果或错误信息
+    task_deduplicated = pyqtSignal(int, str)  # 任务ID, 内容相同的已有文件
+    stats_changed = pyqtSignal(int, int, float)  # 下载中, 排队中, 总速度
+
+    default_workers = 4
+    max_retries = 5
+    backoff_base = 1.0  # 秒
+    timeout = (10, 30)
+    chunk_size = 256 * 1024
+    report_interval = 0.25  # 进度信号的最小间隔(秒)
+    segment_threshold = 16 * 1024 * 1024  # 超过该大小且服务器支持Range时分段下载
+    max_segments = 4
+    min_segment_size = 4 * 1024 * 1024
+    dedup_mode = 'hardlink'  # 'hardlink'或'skip'
+
+    def __init__(self, workers=None, parent=None):
+        super().__init__(parent)
+        self.headers = {
+            'User-Agent': CrawlerThread.headers['User-Agent'],
+            'Accept-Encoding': 'identity',  # 字节范围必须对应原始内容
+        }
+        # 重试由任务自己处理，以便从断点续传
+        self.session = create_http_session(16, retries=0)
+        self.pool = QThreadPool(self)
+        self.set_max_workers(workers or self.default_workers)
+        self.tasks = {}  # 任务ID -> 未结束的DownloadTask
+        self.by_url = {}  # 规范URL -> 任务ID，包括已完成的任务
+        self.reserved = set()  # 未结束任务占用的保存路径
+        self.speeds = {}  # 任务ID -> 最近速度
+        self.next_id = 1
+        self.task_progress.connect(self._on_progress)
+        self.task_finished.connect(self._on_finished)
+
+    def set_max_workers(self, workers):
+        self.pool.setMaxThreadCount(max(1, workers))
+
+    @staticmethod
+    def file_name_for(url):
+        name = unquote(os.path.basename(urlparse(url).path))
+        name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', name).strip(' .')
+        return name[:200] or 'download'
+
+    def reserve_path(self, directory, name, url):
+        """选择不与已有文件和其他任务冲突的保存路径；同一URL未完成的.part会被继续使用"""
+        base, ext = os.path.splitext(name)
+        counter = 0
+        while True:
+            candidate = name if counter == 0 else f"{base}_{counter}{ext}"
+            path = os.path.join(directory, candidate)
+            counter += 1
+            if path in self.reserved or os.path.exists(path):
+                continue
+            if os.path.exists(path + '.part') and DownloadTask.read_meta(path).get('url') != url:
+                continue
+            return path
+
+    def download(self, url, directory):
+        """加入下载队列并返回任务ID；该URL正在下载或已经下载过时返回None"""
+        key = normalize_url(url)
+        if key in self.by_url:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = self.reserve_path(directory, self.file_name_for(url), url)
+        task_id = self.next_id
+        self.next_id += 1
+        task = DownloadTask(self, task_id, url, path)
+        self.tasks[task_id] = task
+        self.by_url[key] = task_id
+        self.reserved.add(path)
+        self.task_added.emit(task_id, url, path)
+        self.pool.start(task)
+        self.emit_stats()
+        return task_id
+
+    def cancel(self, task_id):
+        task = self.tasks.get(task_id)
+        if task is None:
+            return
+        task.cancelled = True
+        if self.pool.tryTake(task):
+            self.task_finished.emit(task_id, False, "已取消")
+
+    def cancel_all(self):
+        for task_id in list(self.tasks):
+            self.cancel(task_id)
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.waitForDone(3000)
+
+    def emit_stats(self):
+        active = sum(1 for task in self.tasks.values() if task.started)
+        self.stats_changed.emit(active, len(self.tasks) - active, sum(self.speeds.values()))
+
+    def _on_progress(self, task_id, received, total, speed):
+        if task_id in self.tasks:
+            self.speeds[task_id] = speed
+            self.emit_stats()
+
+    def _on_finished(self, task_id, ok, message):
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return
+        self.reserved.discard(task.path)
+        self.speeds.pop(task_id, None)
+        if not ok:
+            # 失败或取消的URL允许重新下载
+            self.by_url.pop(normalize_url(task.url), None)
+        self.emit_stats()
+
+_download_manager = None
+
+# 获取共享的下载管理器
+def get_download_manager():
+    """获取进程内共享的下载管理器"""
+    global _download_manager
+    if _download_manager is None:
+        _download_manager = DownloadManager()
+    return _download_manager
 
 # 文件详情窗口
 class FileDetailsWindow(QMainWindow):
@@ -551,8 +3157,12 @@ class FileDetailsWindow(QMainWindow):
 
         # 文件图标
         self.icon_label = QLabel()
-        icon = icon_provider.icon(file_info)
-        self.icon_label.setPixmap(icon.pixmap(64, 64))
+        pixmap_cache = get_pixmap_cache()
+        pixmap = pixmap_cache.get(f"icon:{self.file_path}", 64, 64)
+        if pixmap is None:
+            pixmap = icon_provider.icon(file_info).pixmap(64, 64)
+            pixmap_cache.put(f"icon:{self.file_path}", 64, 64, pixmap)
+        self.icon_label.setPixmap(pixmap)
         self.icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(self.icon_label)
 
@@ -635,14 +3245,15 @@ class FileDetailsWindow(QMainWindow):
             "图标文件 (*.ico *.png *.jpg *.jpeg)"
         )
         if icon_path:
-            icon = QIcon(icon_path)
-            self.icon_label.setPixmap(icon.pixmap(64, 64))
+            pixmap_cache = get_pixmap_cache()
+            pixmap = pixmap_cache.get(icon_path, 64, 64)
+            if pixmap is None:
+                pixmap = QIcon(icon_path).pixmap(64, 64)
+                pixmap_cache.put(icon_path, 64, 64, pixmap)
+            self.icon_label.setPixmap(pixmap)
 
     def format_size(self, size):
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-            if size < 1024.0:
-                return f"{size:.2f} {unit}"
-            size /= 1024.0
+        return format_size(size)
 
     def open_file(self):
         QDesktopServices.openUrl(QUrl.fromLocalFile(self.file_path))
@@ -723,17 +3334,726 @@ class PreviewWindow(QMainWindow):
             self.web_view.setUrl(QUrl(url))
             layout.addWidget(self.web_view)
 
+# 生成文字图标
+_text_pixmaps = {}
+
+def make_text_pixmap(text, size=150, point_size=48):
+    """把emoji或提示文字绘制成图标，相同参数只绘制一次"""
+    key = (text, size, point_size)
+    pixmap = _text_pixmaps.get(key)
+    if pixmap is None:
+        pixmap = QPixmap(size, size)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        font = QFont()
+        font.setPointSize(point_size)
+        painter.setFont(font)
+        painter.setPen(QColor('white'))
+        painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter | Qt.TextFlag.TextWordWrap, text)
+        painter.end()
+        _text_pixmaps[key] = pixmap
+    return pixmap
+
+# 磁盘LRU缓存
+class DiskCache:
+    """按大小预算淘汰的磁盘缓存目录，每个条目一个文件，文件的mtime记录最近使用时间。
+
+    子类决定键和文件内容；写入条目后调用_record_write()，总大小超过budget_bytes时按最久未使用淘汰。
+    可在多个线程中同时使用。
+    """
+
+    suffix = '.cache'
+    default_budget_mb = 64
+
+    def __init__(self, cache_dir, budget_bytes=None):
+        self.cache_dir = cache_dir
+        self.budget_bytes = budget_bytes or self.default_budget_mb * 1024 * 1024
+        self.lock = threading.Lock()
+        self.total_bytes = None  # 首次写入时统计
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)  # 记录最近使用时间
+        except OSError:
+            pass
+
+    @staticmethod
+    def _size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _record_write(self, delta):
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += delta
+            if self.total_bytes > self.budget_bytes:
+                self._evict()
+
+    def _iter_files(self):
+        for root, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(self.suffix):
+                    yield os.path.join(root, name)
+
+    def _scan_size(self):
+        return sum(self._size(path) for path in self._iter_files())
+
+    def _evict(self):
+        """删除最久未使用的条目，直到总大小降到预算的90%以下"""
+        entries = []
+        for path in self._iter_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total = sum(entry[1] for entry in entries)
+        target = self.budget_bytes * 0.9
+        for _mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+# 磁盘缩略图缓存
+class ThumbnailDiskCache(DiskCache):
+    """把缩略图保存在磁盘上，键由(路径, 修改时间, 文件大小, 缩略图尺寸)计算，源文件变化后自动失效。"""
+
+    suffix = '.thumb'
+    default_budget_mb = 256
+
+    def __init__(self, cache_dir=None, budget_bytes=None):
+        super().__init__(cache_dir or get_thumbnail_cache_path(), budget_bytes)
+
+    @staticmethod
+    def make_key(file_path, size):
+        """根据源文件的当前状态生成缓存键，文件不存在时返回None"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        raw = f"{file_path}|{stat.st_mtime_ns}|{stat.st_size}|{size}"
+        return hashlib.sha1(raw.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        image = QImage(path)
+        if image.isNull():
+            return None
+        self._touch(path)
+        return image
+
+    def put(self, key, image):
+        if image.isNull():
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            # 带透明通道的图片保存为PNG，其余保存为体积更小的JPEG
+            if not image.save(tmp_path, 'PNG' if image.hasAlphaChannel() else 'JPG', 85):
+                return
+            os.replace(tmp_path, path)
+            written = os.path.getsize(path)
+        except OSError as e:
+            print(f"写入缩略图缓存时出错: {str(e)}")
+            return
+        self._record_write(written)
+
+_thumbnail_disk_cache = None
+_thumbnail_disk_cache_lock = threading.Lock()
+
+# 获取共享的磁盘缩略图缓存
+def get_thumbnail_disk_cache():
+    """获取进程内共享的磁盘缩略图缓存"""
+    global _thumbnail_disk_cache
+    with _thumbnail_disk_cache_lock:
+        if _thumbnail_disk_cache is None:
+            _thumbnail_disk_cache = ThumbnailDiskCache()
+        return _thumbnail_disk_cache
+
+# 爬虫HTTP响应缓存
+class HttpCache(DiskCache):
+    """保存爬取过的网页和图片的ETag/Last-Modified，以及图片正文或从网页提取出的资源列表。
+
+    再次请求同一URL时带上If-None-Match/If-Modified-Since，服务器返回304时直接复用缓存内容。
+    条目文件第一行是JSON元数据，其后是原始正文；键由规范化后的URL计算。
+    """
+
+    suffix = '.http'
+    default_budget_mb = 128
+    max_entry_fraction = 16  # 单个条目最多占预算的1/16
+
+    def __init__(self, cache_dir=None, budget_bytes=None):
+        super().__init__(cache_dir or get_http_cache_path(), budget_bytes)
+
+    @staticmethod
+    def make_key(url):
+        return hashlib.sha1(normalize_url(url).encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def get(self, url, kind):
+        """返回kind类型('page'或'image')的缓存(元数据, 正文)，没有时返回None"""
+        path = self._path(self.make_key(url))
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if meta.get('kind') != kind:
+            return None
+        self._touch(path)
+        return meta, body
+
+    @staticmethod
+    def conditional_headers(cached):
+        """根据缓存条目生成条件请求头"""
+        headers = {}
+        if cached is not None:
+            meta = cached[0]
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def put(self, url, kind, response, body=b'', **extra):
+        """保存响应的校验信息和正文；响应既没有ETag也没有Last-Modified时无法重新验证，不保存"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+        meta = json.dumps(dict(extra, url=url, kind=kind, etag=etag, last_modified=last_modified,
+                               stored=time.time())).encode('utf-8')
+        if len(meta) + len(body) > self.budget_bytes // self.max_entry_fraction:
+            return
+        path = self._path(self.make_key(url))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = self._size(path)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(meta + b'\n')
+                f.write(body)
+            os.replace(tmp_path, path)
+            written = os.path.getsize(path)
+        except OSError as e:
+            print(f"写入HTTP缓存时出错: {str(e)}")
+            return
+        self._record_write(written - previous)
+
+_http_cache = None
+_http_cache_lock = threading.Lock()
+
+# 获取共享的HTTP缓存
+def get_http_cache():
+    """获取进程内共享的爬虫HTTP缓存"""
+    global _http_cache
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HttpCache()
+        return _http_cache
+
+# 内存像素图缓存
+class PixmapCache:
+    """进程内共享的QPixmap缓存，键为(来源, 宽, 高)，来源可以是文件路径或URL。
+
+    媒体缩略图、爬虫预览和文件详情图标共用同一个缓存，避免重复解码；
+    总内存超过limit_bytes时淘汰最久未使用的图像。QPixmap只能在GUI线程中使用，本缓存也一样。
+    """
+
+    default_limit_mb = 128
+
+    def __init__(self, limit_bytes=None):
+        self.limit_bytes = limit_bytes or self.default_limit_mb * 1024 * 1024
+        self.entries = OrderedDict()  # (来源, 宽, 高) -> QPixmap
+        self.sizes = {}  # 来源 -> {(宽, 高), ...}
+        self.total_bytes = 0
+
+    @staticmethod
+    def pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def get(self, source, width, height):
+        key = (source, width, height)
+        pixmap = self.entries.get(key)
+        if pixmap is not None:
+            self.entries.move_to_end(key)
+        return pixmap
+
+    def put(self, source, width, height, pixmap):
+        key = (source, width, height)
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= self.pixmap_bytes(old)
+        self.entries[key] = pixmap
+        self.sizes.setdefault(source, set()).add((width, height))
+        self.total_bytes += self.pixmap_bytes(pixmap)
+        while self.total_bytes > self.limit_bytes and len(self.entries) > 1:
+            (old_source, old_width, old_height), old = self.entries.popitem(last=False)
+            self.total_bytes -= self.pixmap_bytes(old)
+            sizes = self.sizes.get(old_source)
+            if sizes:
+                sizes.discard((old_width, old_height))
+                if not sizes:
+                    del self.sizes[old_source]
+
+    def remove(self, source):
+        """删除某个来源的所有尺寸"""
+        for width, height in self.sizes.pop(source, ()):
+            pixmap = self.entries.pop((source, width, height), None)
+            if pixmap is not None:
+                self.total_bytes -= self.pixmap_bytes(pixmap)
+
+    def set_limit(self, limit_bytes):
+        self.limit_bytes = limit_bytes
+        # 以当前内容重新放入最后一项，触发淘汰
+        if self.entries:
+            key, pixmap = self.entries.popitem()
+            self.total_bytes -= self.pixmap_bytes(pixmap)
+            self.put(*key, pixmap)
+
+_pixmap_cache = None
+
+# 获取共享的像素图缓存
+def get_pixmap_cache():
+    """获取进程内共享的像素图缓存，只能在GUI线程中调用"""
+    global _pixmap_cache
+    if _pixmap_cache is None:
+        _pixmap_cache = PixmapCache()
+    return _pixmap_cache
+
+# 缩略图解码任务
+class ThumbnailTask(QRunnable):
+    def __init__(self, loader, file_path, size, video=False):
+        super().__init__()
+        self.setAutoDelete(False)  # 由ThumbnailLoader持有，便于从队列中取消
+        self.loader = loader
+        self.file_path = file_path
+        self.size = size
+        self.video = video
+        self.cancelled = False
+
+    def run(self):
+        if self.cancelled:
+            return
+        disk_cache = get_thumbnail_disk_cache()
+        key = disk_cache.make_key(self.file_path, self.size)
+        image = disk_cache.get(key) if key else None
+        if image is not None:
+            self.loader.thumbnail_ready.emit(self.file_path, image)
+            return
+        if self.video:
+            # 视频帧只能由GUI线程中的播放器截取
+            if not self.cancelled:
+                self.loader.video_needed.emit(self.file_path)
+            return
+
+        image = QImage()
+        try:
+            reader = QImageReader(self.file_path)
+            reader.setAutoTransform(True)
+            source_size = reader.size()
+            if source_size.isValid():
+                # 让解码器直接输出缩小后的图像，避免在内存中展开整张大图
+                reader.setScaledSize(source_size.scaled(self.size, self.size,
+                                                        Qt.AspectRatioMode.KeepAspectRatio))
+            image = reader.read()
+        except Exception as e:
+            print(f"生成缩略图时出错: {str(e)}")
+        if key and not image.isNull():
+            disk_cache.put(key, image)
+        if not self.cancelled:
+            self.loader.thumbnail_ready.emit(self.file_path, image)
+
+# 视频封面帧提取
+class VideoThumbnailExtractor(QObject):
+    """用QMediaPlayer和QVideoSink截取视频的封面帧。
+
+    播放器必须在GUI线程中创建，实际解码由多媒体后端的线程完成。
+    同时最多max_active个播放器，两次启动之间至少间隔start_interval毫秒，
+    因此快速滚动大型视频库时不会一次打开大量视频。
+    """
+    thumbnail_ready = pyqtSignal(str, QImage)
+
+    max_active = 2
+    start_interval = 150  # 毫秒
+    timeout = 8000  # 单个视频最长等待时间(毫秒)
+    seek_ratio = 0.1  # 跳到时长的10%处截图，跳过片头黑屏
+    max_seek = 10000  # 最多跳到第10秒
+
+    def __init__(self, size=150, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.queue = deque()
+        self.active = {}  # 文件路径 -> 正在处理的任务
+        self.start_timer = QTimer(self)
+        self.start_timer.setSingleShot(True)
+        self.start_timer.timeout.connect(self._start_next)
+
+    def enqueue(self, file_path):
+        if file_path in self.active or file_path in self.queue:
+            return
+        self.queue.append(file_path)
+        self._schedule()
+
+    def cancel(self, file_path):
+        try:
+            self.queue.remove(file_path)
+        except ValueError:
+            pass
+        job = self.active.get(file_path)
+        if job is not None:
+            self._finish(file_path, job, None, emit=False)
+
+    def _schedule(self):
+        if self.queue and len(self.active) < self.max_active and not self.start_timer.isActive():
+            self.start_timer.start(self.start_interval)
+
+    def _start_next(self):
+        if not self.queue or len(self.active) >= self.max_active:
+            return
+        file_path = self.queue.popleft()
+        job = {
+            'player': QMediaPlayer(self),
+            'sink': QVideoSink(self),
+            'timer': QTimer(self),
+            'target': 0,
+        }
+        self.active[file_path] = job
+        job['player'].setVideoSink(job['sink'])
+        job['player'].mediaStatusChanged.connect(lambda status: self._on_status(file_path, job, status))
+        job['player'].errorOccurred.connect(lambda *args: self._finish(file_path, job, None))
+        job['sink'].videoFrameChanged.connect(lambda frame: self._on_frame(file_path, job, frame))
+        job['timer'].setSingleShot(True)
+        job['timer'].timeout.connect(lambda: self._finish(file_path, job, None))
+        job['timer'].start(self.timeout)
+        job['player'].setSource(QUrl.fromLocalFile(file_path))
+        self._schedule()
+
+    def _on_status(self, file_path, job, status):
+        if self.active.get(file_path) is not job:
+            return
+        if status == QMediaPlayer.MediaStatus.LoadedMedia:
+            duration = job['player'].duration()
+            if duration > 0:
+                job['target'] = int(min(duration * self.seek_ratio, self.max_seek))
+                job['player'].setPosition(job['target'])
+            job['player'].play()
+        elif status == QMediaPlayer.MediaStatus.InvalidMedia:
+            self._finish(file_path, job, None)
+
+    def _on_frame(self, file_path, job, frame):
+        if self.active.get(file_path) is not job or not frame.isValid():
+            return
+        if job['player'].position() + 500 < job['target']:
+            return  # 还没有跳到目标位置
+        image = frame.toImage()
+        if image.isNull():
+            return
+        self._finish(file_path, job, image.scaled(self.size, self.size, Qt.AspectRatioMode.KeepAspectRatio,
+                                                  Qt.TransformationMode.SmoothTransformation))
+
+    def _finish(self, file_path, job, image, emit=True):
+        if self.active.get(file_path) is not job:
+            return
+        del self.active[file_path]
+        job['timer'].stop()
+        job['player'].stop()
+        for obj in job.values():
+            if isinstance(obj, QObject):
+                obj.deleteLater()
+        if emit:
+            self.thumbnail_ready.emit(file_path, image if image is not None else QImage())
+        self._schedule()
+
+# 后台缩略图加载
+class ThumbnailLoader(QObject):
+    """在独立线程池中解码图片缩略图，完成后通过thumbnail_ready发送QImage（解码失败时为空图像）。
+
+    视频先在线程池中查磁盘缓存，未命中时交给VideoThumbnailExtractor截取封面帧，结果同样写入磁盘缓存。
+    同一路径只会排队一次；cancel_except()会撤销不再可见的单元格的请求。
+    """
+    thumbnail_ready = pyqtSignal(str, QImage)
+    video_needed = pyqtSignal(str)
+
+    def __init__(self, size=150, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, QThreadPool.globalInstance().maxThreadCount() - 1))
+        self.pending = {}  # 文件路径 -> ThumbnailTask
+        self.thumbnail_ready.connect(self._on_ready)
+        self.video_extractor = VideoThumbnailExtractor(size, self)
+        self.video_extractor.thumbnail_ready.connect(self._on_video_ready)
+        self.video_needed.connect(self._on_video_needed)
+
+    def request(self, file_path, video=False):
+        if file_path in self.pending:
+            return
+        task = ThumbnailTask(self, file_path, self.size, video)
+        self.pending[file_path] = task
+        self.pool.start(task)
+
+    def cancel(self, file_paths):
+        for file_path in file_paths:
+            task = self.pending.pop(file_path, None)
+            if task is not None:
+                task.cancelled = True
+                self.pool.tryTake(task)
+                if task.video:
+                    self.video_extractor.cancel(file_path)
+
+    def cancel_except(self, keep_paths):
+        self.cancel([path for path in self.pending if path not in keep_paths])
+
+    def _on_ready(self, file_path, image):
+        self.pending.pop(file_path, None)
+
+    def _on_video_needed(self, file_path):
+        if file_path in self.pending:
+            self.video_extractor.enqueue(file_path)
+
+    def _on_video_ready(self, file_path, image):
+        if file_path not in self.pending:
+            return
+        if not image.isNull():
+            def store():
+                disk_cache = get_thumbnail_disk_cache()
+                key = disk_cache.make_key(file_path, self.size)
+                if key:
+                    disk_cache.put(key, image)
+            self.pool.start(store)
+        self.thumbnail_ready.emit(file_path, image)
+
+_thumbnail_loader = None
+
+# 获取共享的缩略图加载器
+def get_thumbnail_loader():
+    """获取进程内共享的缩略图加载器，所有页面共用同一个线程池"""
+    global _thumbnail_loader
+    if _thumbnail_loader is None:
+        _thumbnail_loader = ThumbnailLoader()
+    return _thumbnail_loader
+
+# 计算视图中可见的文件
+def visible_paths(view, margin_rows=1):
+    """返回图标模式列表视图中当前可见（以及上下各margin_rows行）单元格对应的文件路径"""
+    grid = view.gridSize()
+    viewport = view.viewport().rect()
+    if grid.width() <= 0 or grid.height() <= 0:
+        return set()
+    paths = set()
+    y = -margin_rows * grid.height() + grid.height() // 2
+    while y < viewport.height() + margin_rows * grid.height():
+        x = grid.width() // 2
+        while x < viewport.width():
+            index = view.indexAt(QPoint(x, y))
+            if index.isValid():
+                paths.add(index.data(FileGridModel.PathRole))
+            x += grid.width()
+        y += grid.height()
+    return paths
+
+# 文件网格模型
+class FileGridModel(QAbstractListModel):
+    """媒体和文档页面共用的列表模型。
+
+    只保存(文件名, 路径, 类型)元组，图标由decoration函数按需提供；
+    QListView只会为可见的单元格请求数据，因此内存和布局开销与文件总数无关。
+    """
+    PathRole = Qt.ItemDataRole.UserRole
+    TypeRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, decoration=None, parent=None):
+        super().__init__(parent)
+        self.entries = []
+        self.rows = {}  # 文件路径 -> 行号
+        self.decoration = decoration  # 函数(文件路径, 类型) -> QPixmap
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name, path, file_type = self.entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return name
+        if role == Qt.ItemDataRole.DecorationRole and self.decoration:
+            return self.decoration(path, file_type)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        if role == self.PathRole:
+            return path
+        if role == self.TypeRole:
+            return file_type
+        return None
+
+    def add_entries(self, entries):
+        """追加(文件名, 路径, 类型)，跳过已存在的路径，返回实际加入的条目"""
+        new_entries = []
+        seen = set()
+        for entry in entries:
+            if entry[1] not in self.rows and entry[1] not in seen:
+                seen.add(entry[1])
+                new_entries.append(entry)
+        if not new_entries:
+            return []
+        start = len(self.entries)
+        self.beginInsertRows(QModelIndex(), start, start + len(new_entries) - 1)
+        for offset, entry in enumerate(new_entries):
+            self.rows[entry[1]] = start + offset
+            self.entries.append(entry)
+        self.endInsertRows()
+        return new_entries
+
+    def remove_paths(self, paths):
+        """删除指定路径，返回被删除的条目"""
+        targets = {path for path in paths if path in self.rows}
+        if not targets:
+            return []
+        removed = [self.entries[self.rows[path]] for path in targets]
+        if len(targets) == 1:
+            row = self.rows[next(iter(targets))]
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.entries[row]
+            self.endRemoveRows()
+        else:
+            self.beginResetModel()
+            self.entries = [entry for entry in self.entries if entry[1] not in targets]
+            self.endResetModel()
+        self.rows = {entry[1]: i for i, entry in enumerate(self.entries)}
+        return removed
+
+    def clear(self):
+        self.beginResetModel()
+        self.entries = []
+        self.rows = {}
+        self.endResetModel()
+
+    def path_changed(self, path):
+        """通知视图某个文件的图标已更新"""
+        row = self.rows.get(path)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+# 文件搜索结果模型
+class SearchResultModel(QAbstractTableModel):
+    """文件搜索结果的两列表格模型（文件名、路径），只保存元组，视图按需取数据"""
+    PathRole = Qt.ItemDataRole.UserRole
+    headers = ("文件名", "路径")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        name, path = self.entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return name if index.column() == 0 else path
+        if role == Qt.ItemDataRole.ToolTipRole or role == self.PathRole:
+            return path
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.headers[section]
+        return None
+
+    def append(self, entries):
+        if not entries:
+            return
+        start = len(self.entries)
+        self.beginInsertRows(QModelIndex(), start, start + len(entries) - 1)
+        self.entries.extend(entries)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.entries = []
+        self.endResetModel()
+
+# 创建文件网格视图
+def create_file_grid_view(model, icon_size):
+    """创建图标模式的QListView，统一尺寸并分批布局，只绘制可见单元格"""
+    view = QListView()
+    view.setModel(model)
+    view.setViewMode(QListView.ViewMode.IconMode)
+    view.setResizeMode(QListView.ResizeMode.Adjust)
+    view.setMovement(QListView.Movement.Static)
+    view.setUniformItemSizes(True)
+    view.setLayoutMode(QListView.LayoutMode.Batched)
+    view.setBatchSize(500)
+    view.setIconSize(QSize(icon_size, icon_size))
+    view.setGridSize(QSize(icon_size + 30, icon_size + 50))
+    view.setWordWrap(True)
+    view.setSpacing(5)
+    view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+    view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+    view.setCursor(Qt.CursorShape.PointingHandCursor)
+    view.setStyleSheet("""
+        QListView {
+            background-color: #1e1e1e;
+            border: none;
+        }
+        QListView::item {
+            background-color: #2d2d2d;
+            border-radius: 8px;
+            color: white;
+        }
+        QListView::item:hover {
+            background-color: #3d3d3d;
+        }
+        QListView::item:selected {
+            background-color: #1976D2;
+        }
+    """)
+    return view
+
 # 媒体子页面
 class MediaSubPage(QWidget):
+    thumbnail_size = 150
+
     def __init__(self, media_type, parent=None):
         super().__init__(parent)
         self.media_type = media_type
+        self.pixmap_cache = get_pixmap_cache()
+        self.thumbnail_loader = get_thumbnail_loader()
+        self.thumbnail_loader.thumbnail_ready.connect(self.on_thumbnail_ready)
         self.setup_ui()
-        self.scanner = MediaScanner(media_type)
-        self.scanner.file_found.connect(self.add_media_to_grid)
-        self.scanner.scan_complete.connect(self.on_scan_complete)
-        self.scanner.progress_signal.connect(self.update_progress)
-        self.media_items = []
+        # 图片、视频和文档页面共用同一次扫描
+        self.scan_coordinator = get_scan_coordinator()
+        self.scan_coordinator.scan_started.connect(self.on_scan_started)
+        self.scan_coordinator.files_found.connect(self.add_media_batch)
+        self.scan_coordinator.files_removed.connect(self.remove_media)
+        self.scan_coordinator.scan_complete.connect(self.on_scan_complete)
+        self.scan_coordinator.progress_signal.connect(self.update_progress)
+        self.scan_coordinator.progress_detail.connect(self.update_progress_detail)
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -763,8 +4083,14 @@ class MediaSubPage(QWidget):
         header_layout.addWidget(self.status_label)
 
         self.refresh_button = QPushButton("刷新")
-        self.refresh_button.clicked.connect(self.start_scan)
+        self.refresh_button.setToolTip("只重新扫描有变化的目录")
+        self.refresh_button.clicked.connect(lambda: self.start_scan())
         header_layout.addWidget(self.refresh_button)
+
+        self.rebuild_button = QPushButton("重建索引")
+        self.rebuild_button.setToolTip("丢弃文件索引并完整扫描所有扫描目录")
+        self.rebuild_button.clicked.connect(lambda: self.start_scan(rebuild=True))
+        header_layout.addWidget(self.rebuild_button)
         layout.addLayout(header_layout)
 
         # Progress Bar
@@ -772,17 +4098,18 @@ class MediaSubPage(QWidget):
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
 
-        # Scroll Area for Media Grid
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-
-        self.scroll_content = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_content)
-        self.grid_layout.setSpacing(10)
+        # Media Grid
+        self.model = FileGridModel(self.get_thumbnail, self)
+        self.view = create_file_grid_view(self.model, self.thumbnail_size)
+        self.view.doubleClicked.connect(lambda index: self.show_media_details(index.data(FileGridModel.PathRole)))
+        layout.addWidget(self.view)
 
-        scroll.setWidget(self.scroll_content)
-        layout.addWidget(scroll)
+        # 滚动停止后撤销已滚出视图的缩略图请求
+        self.visible_timer = QTimer(self)
+        self.visible_timer.setSingleShot(True)
+        self.visible_timer.setInterval(100)
+        self.visible_timer.timeout.connect(self.cancel_hidden_thumbnails)
+        self.view.verticalScrollBar().valueChanged.connect(lambda value: self.visible_timer.start())
 
         # Counter label
         self.counter_label = QLabel(f"{self.media_type.capitalize()}: 0")
@@ -794,102 +4121,70 @@ class MediaSubPage(QWidget):
         self.loading_label.hide()
         layout.addWidget(self.loading_label)
 
-        self.media_count = 0
-        self.current_row = 0
-        self.current_col = 0
-        self.max_columns = 4
+    def ensure_scanned(self):
+        self.scan_coordinator.ensure_scanned()
 
-    def start_scan(self):
-        if self.scanner.isRunning():
-            self.scanner.terminate()
-            self.scanner.wait()
-        self.media_count = 0
-        self.counter_label.setText(f"{self.media_type.capitalize()}: 0")
+    def start_scan(self, rebuild=False):
+        self.scan_coordinator.start_scan(rebuild)
+
+    def on_scan_started(self):
         self.clear_grid()
-        self.current_row = 0
-        self.current_col = 0
         self.status_label.setText(f"正在扫描{self.media_type}文件...")
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.loading_label.show()
-        self.scanner = MediaScanner(self.media_type)
-        self.scanner.file_found.connect(self.add_media_to_grid)
-        self.scanner.scan_complete.connect(self.on_scan_complete)
-        self.scanner.progress_signal.connect(self.update_progress)
-        self.scanner.start()
 
     def clear_grid(self):
-        while self.grid_layout.count():
-            item = self.grid_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        self.media_items.clear()
-        self.media_count = 0
-        self.counter_label.setText(f"{self.media_type.capitalize()}: 0")
+        self.thumbnail_loader.cancel([path for path in self.thumbnail_loader.pending if path in self.model.rows])
+        self.model.clear()
+        self.update_counter()
         self.progress_bar.setValue(0)
 
-    def create_media_widget(self, file_path):
-        widget = QWidget()
-        layout = QVBoxLayout(widget)
-        layout.setSpacing(5)
-
-        # Thumbnail
-        thumbnail = QLabel()
-        thumbnail.setFixedSize(QSize(150, 150))
-        thumbnail.setAlignment(Qt.AlignmentFlag.AlignCenter)
-
-        if self.media_type == 'image':
-            pixmap = QPixmap(file_path)
-            if not pixmap.isNull():
-                pixmap = pixmap.scaled(150, 150, Qt.AspectRatioMode.KeepAspectRatio,
-                                     Qt.TransformationMode.SmoothTransformation)
-                thumbnail.setPixmap(pixmap)
-            else:
-                thumbnail.setText("无法加载图片")
-        elif self.media_type == 'video':
-            thumbnail.setText("🎥")
-            thumbnail.setStyleSheet("QLabel { font-size: 48px; }")
-
-        layout.addWidget(thumbnail)
-
-        # File name label
-        name_label = QLabel(os.path.basename(file_path))
-        name_label.setWordWrap(True)
-        name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(name_label)
-
-        # Make the widget clickable
-        widget.mouseDoubleClickEvent = lambda e: self.show_media_details(file_path)
-        widget.setCursor(Qt.CursorShape.PointingHandCursor)
-        widget.setStyleSheet("""
-            QWidget {
-                background-color: #2d2d2d;
-                border-radius: 8px;
-                padding: 8px;
-            }
-            QWidget:hover {
-                background-color: #3d3d3d;
-            }
-        """)
-
-        return widget
-
-    def add_media_to_grid(self, filename, filepath, media_type):
-        if media_type != self.media_type:
+    def update_counter(self):
+        self.counter_label.setText(f"{self.media_type.capitalize()}: {self.model.rowCount()}")
+
+    def get_thumbnail(self, file_path, media_type):
+        """只会为可见单元格调用；未解码的缩略图先显示占位图，并在后台生成"""
+        pixmap = self.pixmap_cache.get(file_path, self.thumbnail_size, self.thumbnail_size)
+        if pixmap is not None:
+            return pixmap
+        self.thumbnail_loader.request(file_path, video=media_type == 'video')
+        if media_type == 'video':
+            return make_text_pixmap("🎥")
+        return make_text_pixmap("加载中...", point_size=12)
+
+    def on_thumbnail_ready(self, file_path, image):
+        if file_path not in self.model.rows:
             return
-        widget = self.create_media_widget(filepath)
-        self.grid_layout.addWidget(widget, self.current_row, self.current_col)
-
-        self.media_count += 1
-        self.counter_label.setText(f"{self.media_type.capitalize()}: {self.media_count}")
-
-        self.current_col += 1
-        if self.current_col >= self.max_columns:
-            self.current_col = 0
-            self.current_row += 1
-
-        self.media_items.append(widget)
-        self.loading_label.hide()
+        if image.isNull():
+            pixmap = make_text_pixmap("🎥" if self.media_type == 'video' else "无法加载图片",
+                                      point_size=48 if self.media_type == 'video' else 12)
+        else:
+            pixmap = QPixmap.fromImage(image)
+        self.pixmap_cache.put(file_path, self.thumbnail_size, self.thumbnail_size, pixmap)
+        self.model.path_changed(file_path)
+
+    def cancel_hidden_thumbnails(self):
+        keep = visible_paths(self.view)
+        # 其他页面的请求不在本页模型中，保持不动
+        keep.update(path for path in self.thumbnail_loader.pending if path not in self.model.rows)
+        self.thumbnail_loader.cancel_except(keep)
+
+    def hideEvent(self, event):
+        # 页面被切走时不再需要任何缩略图
+        self.thumbnail_loader.cancel([path for path in self.thumbnail_loader.pending if path in self.model.rows])
+        super().hideEvent(event)
+
+    def add_media_batch(self, items):
+        """一批结果只触发一次行插入和计数更新"""
+        if self.model.add_entries([item for item in items if item[2] == self.media_type]):
+            self.update_counter()
+            self.loading_label.hide()
+
+    def remove_media(self, filepaths):
+        for filename, filepath, media_type in self.model.remove_paths(filepaths):
+            self.pixmap_cache.remove(filepath)
+        self.update_counter()
 
     def show_media_details(self, file_path):
         self.details_window = FileDetailsWindow(file_path)
@@ -897,7 +4192,7 @@ class MediaSubPage(QWidget):
 
     def on_scan_complete(self):
         self.loading_label.hide()
-        if self.scanner.scanned_files == 0:
+        if self.model.rowCount() == 0:
             self.status_label.setText(f"未找到{self.media_type}文件")
         else:
             self.status_label.setText("扫描完成")
@@ -906,6 +4201,10 @@ class MediaSubPage(QWidget):
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
+    def update_progress_detail(self, detail):
+        if self.scan_coordinator.is_scanning():
+            self.status_label.setText(f"正在扫描{self.media_type}文件: {ScanProgress.describe(detail)}")
+
 # 媒体页面
 class MediaPage(QWidget):
     def __init__(self, parent=None):
@@ -956,6 +4255,7 @@ class MediaPage(QWidget):
 
     def switch_page(self, index):
         self.stacked_widget.setCurrentIndex(index)
+        self.stacked_widget.currentWidget().ensure_scanned()
         if index == 0:
             self.image_button.setStyleSheet("background-color: #1976D2;")
             self.video_button.setStyleSheet("")
@@ -968,22 +4268,37 @@ class MediaPage(QWidget):
         if current_page:
             current_page.start_scan()
 
+    def ensure_scanned(self):
+        current_page = self.stacked_widget.currentWidget()
+        if current_page:
+            current_page.ensure_scanned()
+
 # 文档页面
 class DocumentPage(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setup_ui()
-        self.scanner = DocumentScanner()
-        self.scanner.file_found.connect(self.add_document_to_grid)
-        self.scanner.scan_complete.connect(self.on_scan_complete)
-        self.scanner.progress_signal.connect(self.update_progress)
-        self.document_items = []
         self.document_counts = {
             'word': 0,
             'excel': 0,
             'powerpoint': 0,
             'pdf': 0
         }
+        self.scanning = False
+        self.content_indexer = None
+        self.content_index_pending = False
+        # 文档变化后稍等片刻再更新全文索引，合并文件监控的连续事件
+        self.content_index_timer = QTimer(self)
+        self.content_index_timer.setSingleShot(True)
+        self.content_index_timer.setInterval(3000)
+        self.content_index_timer.timeout.connect(self.update_content_index)
+        self.setup_ui()
+        self.scan_coordinator = get_scan_coordinator()
+        self.scan_coordinator.scan_started.connect(self.on_scan_started)
+        self.scan_coordinator.files_found.connect(self.add_document_batch)
+        self.scan_coordinator.files_removed.connect(self.remove_documents)
+        self.scan_coordinator.scan_complete.connect(self.on_scan_complete)
+        self.scan_coordinator.progress_signal.connect(self.update_progress)
+        self.scan_coordinator.progress_detail.connect(self.update_progress_detail)
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -1013,8 +4328,14 @@ class DocumentPage(QWidget):
         header_layout.addWidget(self.status_label)
 
         self.refresh_button = QPushButton("刷新")
-        self.refresh_button.clicked.connect(self.start_scan)
+        self.refresh_button.setToolTip("只重新扫描有变化的目录")
+        self.refresh_button.clicked.connect(lambda: self.start_scan())
         header_layout.addWidget(self.refresh_button)
+
+        self.rebuild_button = QPushButton("重建索引")
+        self.rebuild_button.setToolTip("丢弃文件索引并完整扫描所有扫描目录")
+        self.rebuild_button.clicked.connect(lambda: self.start_scan(rebuild=True))
+        header_layout.addWidget(self.rebuild_button)
         layout.addLayout(header_layout)
 
         # Progress Bar
@@ -1031,17 +4352,39 @@ class DocumentPage(QWidget):
             counter_layout.addWidget(label)
         layout.addLayout(counter_layout)
 
-        # Scroll Area for Document Grid
-        scroll = QScrollArea()
-        scroll.setWidgetResizable(True)
-        scroll.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-
-        self.scroll_content = QWidget()
-        self.grid_layout = QGridLayout(self.scroll_content)
-        self.grid_layout.setSpacing(10)
-
-        scroll.setWidget(self.scroll_content)
-        layout.addWidget(scroll)
+        # 全文搜索
+        content_layout = QHBoxLayout()
+        self.content_input = QLineEdit()
+        self.content_input.setPlaceholderText("搜索文档内容（PDF、docx、xlsx、pptx），多个词用空格分隔，词尾加 * 为前缀匹配")
+        self.content_input.returnPressed.connect(self.search_content)
+        content_layout.addWidget(self.content_input)
+
+        self.content_search_button = QPushButton("搜索内容")
+        self.content_search_button.clicked.connect(self.search_content)
+        content_layout.addWidget(self.content_search_button)
+
+        self.content_index_button = QPushButton("更新内容索引")
+        self.content_index_button.setToolTip("提取新增和改动文档的文本")
+        self.content_index_button.clicked.connect(self.update_content_index)
+        content_layout.addWidget(self.content_index_button)
+        layout.addLayout(content_layout)
+
+        self.content_status_label = QLabel("")
+        layout.addWidget(self.content_status_label)
+
+        self.content_results = QTreeWidget()
+        self.content_results.setHeaderLabels(["文件名", "相关度", "路径"])
+        self.content_results.setMaximumHeight(200)
+        self.content_results.itemDoubleClicked.connect(
+            lambda item, column: self.show_document_details(item.data(0, Qt.ItemDataRole.UserRole)))
+        self.content_results.hide()
+        layout.addWidget(self.content_results)
+
+        # Document Grid
+        self.model = FileGridModel(self.get_document_pixmap, self)
+        self.view = create_file_grid_view(self.model, 64)
+        self.view.doubleClicked.connect(lambda index: self.show_document_details(index.data(FileGridModel.PathRole)))
+        layout.addWidget(self.view)
 
         self.loading_label = QLabel("正在加载文档...")
         self.loading_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -1049,72 +4392,29 @@ class DocumentPage(QWidget):
         self.loading_label.hide()
         layout.addWidget(self.loading_label)
 
-        self.current_row = 0
-        self.current_col = 0
-        self.max_columns = 4
+    def ensure_scanned(self):
+        self.scan_coordinator.ensure_scanned()
 
-    def start_scan(self):
-        if self.scanner.isRunning():
-            self.scanner.terminate()
-            self.scanner.wait()
+    def start_scan(self, rebuild=False):
+        self.scan_coordinator.start_scan(rebuild)
+
+    def on_scan_started(self):
+        self.scanning = True
         self.clear_grid()
-        self.current_row = 0
-        self.current_col = 0
         self.status_label.setText("正在扫描文档...")
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.loading_label.show()
-        self.scanner = DocumentScanner()
-        self.scanner.file_found.connect(self.add_document_to_grid)
-        self.scanner.scan_complete.connect(self.on_scan_complete)
-        self.scanner.progress_signal.connect(self.update_progress)
-        self.scanner.start()
 
     def clear_grid(self):
-        while self.grid_layout.count():
-            item = self.grid_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        self.document_items.clear()
+        self.model.clear()
         for doc_type in self.document_counts:
             self.document_counts[doc_type] = 0
-            self.counter_labels[doc_type].setText(f"{doc_type.capitalize()}: 0")
+        self.update_counters()
         self.progress_bar.setValue(0)
 
-    def create_document_widget(self, file_path, doc_type):
-        widget = QWidget()
-        layout = QVBoxLayout(widget)
-        layout.setSpacing(5)
-
-        # Icon/Thumbnail
-        icon_label = QLabel()
-        icon_label.setFixedSize(QSize(64, 64))
-        icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        icon_label.setText(self.get_document_icon(doc_type))
-        icon_label.setStyleSheet("QLabel { font-size: 32px; }")
-        layout.addWidget(icon_label)
-
-        # File name label
-        name_label = QLabel(os.path.basename(file_path))
-        name_label.setWordWrap(True)
-        name_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(name_label)
-
-        # Make the widget clickable
-        widget.mouseDoubleClickEvent = lambda e: self.show_document_details(file_path)
-        widget.setCursor(Qt.CursorShape.PointingHandCursor)
-        widget.setStyleSheet("""
-            QWidget {
-                background-color: #2d2d2d;
-                border-radius: 8px;
-                padding: 8px;
-            }
-            QWidget:hover {
-                background-color: #3d3d3d;
-            }
-        """)
-
-        return widget
+    def get_document_pixmap(self, file_path, doc_type):
+        return make_text_pixmap(self.get_document_icon(doc_type), 64, 32)
 
     def get_document_icon(self, doc_type):
         icons = {
@@ -1125,42 +4425,113 @@ class DocumentPage(QWidget):
         }
         return icons.get(doc_type, '📄')
 
-    def add_document_to_grid(self, filename, filepath, doc_type):
-        widget = self.create_document_widget(filepath, doc_type)
-        self.grid_layout.addWidget(widget, self.current_row, self.current_col)
-
-        self.document_counts[doc_type] += 1
-        self.counter_labels[doc_type].setText(f"{doc_type.capitalize()}: {self.document_counts[doc_type]}")
+    def add_document_batch(self, items):
+        """一批结果只触发一次行插入和计数更新"""
+        added = self.model.add_entries([item for item in items if item[2] in self.document_counts])
+        if not added:
+            return
+        for filename, filepath, doc_type in added:
+            self.document_counts[doc_type] += 1
+        self.update_counters()
+        self.loading_label.hide()
+        if not self.scanning:
+            self.content_index_timer.start()
 
-        self.current_col += 1
-        if self.current_col >= self.max_columns:
-            self.current_col = 0
-            self.current_row += 1
+    def update_counters(self):
+        for doc_type, count in self.document_counts.items():
+            self.counter_labels[doc_type].setText(f"{doc_type.capitalize()}: {count}")
 
-        self.document_items.append(widget)
-        self.loading_label.hide()
+    def remove_documents(self, filepaths):
+        removed = self.model.remove_paths(filepaths)
+        for filename, filepath, doc_type in removed:
+            self.document_counts[doc_type] -= 1
+        self.update_counters()
+        if removed and not self.scanning:
+            self.content_index_timer.start()
 
     def show_document_details(self, file_path):
         self.details_window = FileDetailsWindow(file_path)
         self.details_window.show()
 
     def on_scan_complete(self):
+        self.scanning = False
         self.loading_label.hide()
         if sum(self.document_counts.values()) == 0:
             self.status_label.setText("未找到文档")
         else:
             self.status_label.setText("扫描完成")
         self.progress_bar.setVisible(False)
+        self.content_index_timer.start()
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
+    def update_progress_detail(self, detail):
+        if self.scan_coordinator.is_scanning():
+            self.status_label.setText(f"正在扫描文档: {ScanProgress.describe(detail)}")
+
+    def update_content_index(self):
+        if self.content_indexer and self.content_indexer.isRunning():
+            # 本轮结束后再更新一次
+            self.content_index_pending = True
+            return
+        self.content_index_pending = False
+        self.content_indexer = ContentIndexer()
+        self.content_indexer.progress_signal.connect(self.on_content_index_progress)
+        self.content_indexer.indexing_complete.connect(self.on_content_index_complete)
+        self.content_indexer.start()
+
+    def on_content_index_progress(self, done, total):
+        if total:
+            self.content_status_label.setText(f"正在索引文档内容: {done}/{total}")
+
+    def on_content_index_complete(self, updated, removed):
+        count = get_content_index().document_count()
+        self.content_status_label.setText(f"内容索引已更新：{count} 个文档可搜索（更新 {updated}，移除 {removed}）")
+        if self.content_index_pending:
+            self.update_content_index()
+
+    def search_content(self):
+        text = self.content_input.text().strip()
+        if not text:
+            self.content_results.clear()
+            self.content_results.hide()
+            return
+        start = time.perf_counter()
+        try:
+            results = get_content_index().search(text)
+        except sqlite3.Error as e:
+            self.content_status_label.setText(f"全文搜索出错: {str(e)}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        self.content_results.clear()
+        for name, path, score in results:
+            item = QTreeWidgetItem([name, f"{score:.2f}", path])
+            item.setData(0, Qt.ItemDataRole.UserRole, path)
+            self.content_results.addTopLevelItem(item)
+        self.content_results.show()
+        self.content_status_label.setText(f"找到 {len(results)} 个文档，用时 {elapsed:.0f} 毫秒")
+
+    def stop_content_indexer(self):
+        self.content_index_timer.stop()
+        if self.content_indexer and self.content_indexer.isRunning():
+            self.content_indexer.requestInterruption()
+            self.content_indexer.wait()
+
 # 文件搜索页面
 class FileSearchPage(QWidget):
+    feed_slice = 0.008  # 每次事件循环最多用于插入结果行的时间(秒)
+    feed_chunk = 200
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.parent = parent
         self.search_thread = None
+        # 结果先进入队列，再分时间片插入模型，大批结果也不会长时间占用GUI线程
+        self.pending_results = deque()
+        self.feed_timer = QTimer(self)
+        self.feed_timer.setInterval(0)
+        self.feed_timer.timeout.connect(self.feed_results)
         self.setup_ui()
 
     def setup_ui(self):
@@ -1168,7 +4539,8 @@ class FileSearchPage(QWidget):
         self.setStyleSheet("background-color: #1e1e1e;")
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("输入文件名进行搜索")
+        self.search_input.setPlaceholderText("输入文件名进行搜索，支持 *.jpg 等通配符，re: 开头为正则表达式")
+        self.search_input.returnPressed.connect(self.start_search)
         search_layout.addWidget(self.search_input)
 
         self.search_button = QPushButton("搜索")
@@ -1185,19 +4557,22 @@ class FileSearchPage(QWidget):
         self.progress_bar = QProgressBar()
         layout.addWidget(self.progress_bar)
 
-        self.results_tree = QTreeWidget()
-        self.results_tree.setHeaderLabels(["文件名", "路径"])
-        self.results_tree.itemDoubleClicked.connect(self.show_file_details)
+        self.results_model = SearchResultModel(self)
+        self.results_tree = QTreeView()
+        self.results_tree.setModel(self.results_model)
+        self.results_tree.setRootIsDecorated(False)
+        self.results_tree.setUniformRowHeights(True)
+        self.results_tree.doubleClicked.connect(self.show_file_details)
         self.results_tree.setStyleSheet("""
-            QTreeWidget {
+            QTreeView {
                 background-color: #1e1e1e;
                 color: white;
                 border: 1px solid #333;
             }
-            QTreeWidget::item:hover {
+            QTreeView::item:hover {
                 background-color: #2d2d2d;
             }
-            QTreeWidget::item:selected {
+            QTreeView::item:selected {
                 background-color: #2196F3;
                 color: white;
             }
@@ -1210,10 +4585,11 @@ class FileSearchPage(QWidget):
 
     def start_search(self):
         filename = self.search_input.text()
-        if not filename:
+        # 取消后线程还要一小段时间才结束，搜索按钮在finished_signal到达前保持禁用，回车同样不生效
+        if not filename or (self.search_thread and self.search_thread.isRunning()):
             return
 
-        self.results_tree.clear()
+        self.clear_results()
         self.progress_bar.setValue(0)
         self.status_label.setText("搜索中...")
         self.search_button.setEnabled(False)
@@ -1221,6 +4597,7 @@ class FileSearchPage(QWidget):
 
         self.search_thread = FileSearchThread(filename)
         self.search_thread.update_signal.connect(self.update_results)
+        self.search_thread.results_ranked.connect(self.show_ranked_results)
         self.search_thread.progress_signal.connect(self.update_progress)
         self.search_thread.finished_signal.connect(self.search_finished)
         self.search_thread.start()
@@ -1228,25 +4605,52 @@ class FileSearchPage(QWidget):
     def cancel_search(self):
         if self.search_thread and self.search_thread.isRunning():
             self.search_thread.cancel()
-            self.status_label.setText("搜索已取消")
-            self.search_button.setEnabled(True)
+            self.status_label.setText("正在取消搜索...")
             self.cancel_button.setEnabled(False)
 
-    def update_results(self, filename, filepath):
-        item = QTreeWidgetItem([filename, filepath])
-        self.results_tree.addTopLevelItem(item)
+    def clear_results(self):
+        self.feed_timer.stop()
+        self.pending_results.clear()
+        self.results_model.clear()
+
+    def update_results(self, results):
+        self.pending_results.extend(results)
+        if not self.feed_timer.isActive():
+            self.feed_timer.start()
+
+    def show_ranked_results(self, results):
+        """用排好序的最终结果替换遍历过程中陆续显示的结果"""
+        self.clear_results()
+        self.update_results(results)
+
+    def feed_results(self):
+        deadline = time.perf_counter() + self.feed_slice
+        while self.pending_results and time.perf_counter() < deadline:
+            count = min(self.feed_chunk, len(self.pending_results))
+            self.results_model.append([self.pending_results.popleft() for _ in range(count)])
+        if not self.pending_results:
+            self.feed_timer.stop()
 
     def update_progress(self, value):
         self.progress_bar.setValue(value)
 
     def search_finished(self):
-        self.status_label.setText("搜索完成")
+        thread = self.search_thread
+        if thread.error:
+            self.status_label.setText(thread.error)
+        elif thread.cancel_token.cancelled:
+            self.status_label.setText(f"搜索已取消: 已找到 {thread.match_count} 个匹配")
+        elif thread.match_count > thread.max_results:
+            self.status_label.setText(f"搜索完成: 共 {thread.match_count} 个匹配，显示最相关的 {thread.max_results} 个，"
+                                      f"用时 {thread.elapsed * 1000:.0f} 毫秒")
+        else:
+            self.status_label.setText(f"搜索完成: 共 {thread.match_count} 个匹配，用时 {thread.elapsed * 1000:.0f} 毫秒")
         self.search_button.setEnabled(True)
         self.cancel_button.setEnabled(False)
         self.progress_bar.setValue(100)
 
-    def show_file_details(self, item, column):
-        file_path = item.text(1)  # 获取文件路径（第二列）
+    def show_file_details(self, index):
+        file_path = index.data(SearchResultModel.PathRole)
         self.file_details_window = FileDetailsWindow(file_path)
         self.file_details_window.show()
 
@@ -1257,6 +4661,11 @@ class CrawlerPage(QWidget):
         self.parent = parent
         self.setup_ui()
         self.crawler_thread = None
+        self.preview_labels = {}  # 图片URL -> 等待预览图的标签列表
+        self.media_urls = []  # 本次爬取到的图片和视频，供"全部下载"使用
+        self.preview_fetcher = ImagePreviewFetcher(100, 60, self)
+        self.preview_fetcher.preview_ready.connect(self.on_preview_ready)
+        self.preview_fetcher.preview_failed.connect(self.on_preview_failed)
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -1297,8 +4706,53 @@ class CrawlerPage(QWidget):
         self.stop_button.clicked.connect(self.stop_crawling)
         input_layout.addWidget(self.stop_button)
 
+        self.download_all_button = QPushButton("全部下载")
+        self.download_all_button.setFixedWidth(100)
+        self.download_all_button.setToolTip("下载爬取到的所有图片和视频")
+        self.download_all_button.clicked.connect(self.download_all)
+        input_layout.addWidget(self.download_all_button)
+
         layout.addLayout(input_layout)
 
+        # 多页面爬取选项
+        options_layout = QHBoxLayout()
+        option_style = """
+            background-color: #1e1e1e;
+            color: white;
+            padding: 3px;
+            border: 1px solid #333;
+            border-radius: 4px;
+        """
+
+        def add_spin(label, minimum, maximum, value, tooltip, special_text=None):
+            spin = QSpinBox()
+            spin.setRange(minimum, maximum)
+            spin.setValue(value)
+            spin.setToolTip(tooltip)
+            spin.setStyleSheet(option_style)
+            if special_text:
+                spin.setSpecialValueText(special_text)
+            options_layout.addWidget(QLabel(label))
+            options_layout.addWidget(spin)
+            return spin
+
+        self.depth_spin = add_spin("深度:", 0, 10, 0, "沿链接继续爬取的层数，0表示只爬取当前页面", "仅当前页")
+        self.max_pages_spin = add_spin("最多页面:", 1, 10000, 100, "多页面爬取时最多抓取的页面数")
+        self.host_limit_spin = add_spin("每主机并发:", 1, 16, 2, "同一主机同时进行的请求数")
+        self.delay_spin = add_spin("间隔(毫秒):", 0, 10000, 500, "同一主机两次请求之间的最小间隔")
+
+        self.same_domain_check = QCheckBox("仅同域")
+        self.same_domain_check.setChecked(True)
+        self.same_domain_check.setToolTip("只跟随起始网址所在域名（含子域名）的链接")
+        options_layout.addWidget(self.same_domain_check)
+
+        self.scope_input = QLineEdit()
+        self.scope_input.setPlaceholderText("范围正则(可选)")
+        self.scope_input.setToolTip("只跟随匹配该正则表达式的链接")
+        self.scope_input.setStyleSheet(option_style)
+        options_layout.addWidget(self.scope_input)
+        layout.addLayout(options_layout)
+
         self.progress_bar = QProgressBar()
         layout.addWidget(self.progress_bar)
 
@@ -1316,9 +4770,50 @@ class CrawlerPage(QWidget):
         """)
         layout.addWidget(self.scroll_area)
 
+        # 下载列表
+        download_header = QHBoxLayout()
+        self.download_stats_label = QLabel("下载: 无任务")
+        self.download_stats_label.setStyleSheet("color: #4CAF50; background-color: transparent;")
+        download_header.addWidget(self.download_stats_label)
+        download_header.addStretch()
+        self.cancel_downloads_button = QPushButton("取消全部下载")
+        self.cancel_downloads_button.clicked.connect(lambda: get_download_manager().cancel_all())
+        download_header.addWidget(self.cancel_downloads_button)
+        layout.addLayout(download_header)
+
+        self.download_list = QTreeWidget()
+        self.download_list.setHeaderLabels(["文件", "大小", "进度", "速度", "状态"])
+        self.download_list.setRootIsDecorated(False)
+        self.download_list.setMaximumHeight(160)
+        self.download_list.setColumnWidth(0, 260)
+        self.download_list.itemDoubleClicked.connect(self.open_download)
+        self.download_list.setStyleSheet("""
+            QTreeWidget {
+                background-color: #1e1e1e;
+                color: white;
+                border: 1px solid #333;
+            }
+            QTreeWidget::item:selected {
+                background-color: #2196F3;
+                color: white;
+            }
+        """)
+        layout.addWidget(self.download_list)
+        self.download_items = {}  # 任务ID -> QTreeWidgetItem
+
+        manager = get_download_manager()
+        manager.task_added.connect(self.on_download_added)
+        manager.task_progress.connect(self.on_download_progress)
+        manager.task_status.connect(self.on_download_status)
+        manager.task_finished.connect(self.on_download_finished)
+        manager.task_deduplicated.connect(self.on_download_deduplicated)
+        manager.stats_changed.connect(self.on_download_stats)
+
     def update_ui(self, url, file_type):
         # 调试信息
         print(f"收到爬取结果: {url} - {file_type}")
+        if file_type in ('image', 'video'):
+            self.media_urls.append(url)
 
         item_widget = QWidget()
         item_layout = QHBoxLayout(item_widget)
@@ -1353,23 +4848,9 @@ class CrawlerPage(QWidget):
                 label = QLabel()
                 label.setText("加载中...")
 
-                # 使用QTimer延迟加载图片，避免UI阻塞
-                def load_image():
-                    try:
-                        response = requests.get(url, timeout=5)
-                        if response.status_code == 200:
-                            pixmap = QPixmap()
-                            pixmap.loadFromData(response.content)
-                            if not pixmap.isNull():
-                                label.setPixmap(pixmap.scaled(100, 60, Qt.AspectRatioMode.KeepAspectRatio))
-                            else:
-                                label.setText("图片加载失败")
-                        else:
-                            label.setText("请求失败")
-                    except Exception as e:
-                        label.setText(f"错误: {str(e)[:20]}")
-
-                QTimer.singleShot(100, load_image)
+                # 图片在后台线程池中下载解码，完成后由on_preview_ready填充
+                self.preview_labels.setdefault(url, []).append(label)
+                self.preview_fetcher.request(url)
 
                 label.setCursor(QCursor(Qt.CursorShape.PointingHandCursor))
                 label.mousePressEvent = lambda e: self.preview_media(url, 'image')
@@ -1426,6 +4907,21 @@ class CrawlerPage(QWidget):
         item_layout.addStretch()
         self.scroll_layout.addWidget(item_widget)
 
+    def on_preview_ready(self, url, pixmap):
+        for label in self.preview_labels.pop(url, []):
+            label.setPixmap(pixmap)
+
+    def on_preview_failed(self, url, message):
+        for label in self.preview_labels.pop(url, []):
+            label.setText(message)
+
+    def cancel_previews(self):
+        self.preview_fetcher.cancel_all()
+        for labels in self.preview_labels.values():
+            for label in labels:
+                label.setText("已取消")
+        self.preview_labels.clear()
+
     def preview_media(self, url, media_type):
         self.preview_window = PreviewWindow(url, media_type)
         self.preview_window.show()
@@ -1436,6 +4932,75 @@ class CrawlerPage(QWidget):
         else:
             self.show_status(f"下载功能未实现")
 
+    def download_all(self):
+        # 嵌入播放页(YouTube等)不是媒体文件，跳过
+        urls = [url for url in self.media_urls
+                if not any(host in url for host in PageExtractor.video_hosts)]
+        if not urls:
+            self.show_status("没有可下载的图片或视频")
+            return
+        manager = get_download_manager()
+        try:
+            added = sum(1 for url in urls if manager.download(url, self.parent.download_directory) is not None)
+        except OSError as e:
+            self.show_status(f"下载失败: {str(e)}")
+            return
+        self.show_status(f"已加入 {added} 个下载任务，跳过 {len(urls) - added} 个已在列表中的文件")
+
+    def on_download_added(self, task_id, url, path):
+        item = QTreeWidgetItem([os.path.basename(path), "", "0%", "", "排队中"])
+        item.setToolTip(0, url)
+        item.setData(0, Qt.ItemDataRole.UserRole, path)
+        self.download_list.addTopLevelItem(item)
+        self.download_items[task_id] = item
+
+    def on_download_progress(self, task_id, received, total, speed):
+        item = self.download_items.get(task_id)
+        if item is None:
+            return
+        item.setText(1, format_size(total) if total else format_size(received))
+        item.setText(2, f"{received * 100 // total}%" if total else "")
+        item.setText(3, f"{format_size(speed)}/s")
+        item.setText(4, "下载中")
+
+    def on_download_status(self, task_id, message):
+        item = self.download_items.get(task_id)
+        if item is not None:
+            item.setText(3, "")
+            item.setText(4, message)
+
+    def on_download_finished(self, task_id, ok, message):
+        item = self.download_items.get(task_id)
+        if item is None:
+            return
+        item.setText(3, "")
+        if ok:
+            item.setText(2, "100%")
+            item.setText(4, message)
+        else:
+            item.setText(4, message)
+            item.setToolTip(4, message)
+
+    def on_download_deduplicated(self, task_id, existing_path):
+        item = self.download_items.get(task_id)
+        if item is None:
+            return
+        item.setToolTip(4, f"与已有文件内容相同: {existing_path}")
+        if not os.path.exists(item.data(0, Qt.ItemDataRole.UserRole)):
+            item.setData(0, Qt.ItemDataRole.UserRole, existing_path)
+
+    def on_download_stats(self, active, queued, speed):
+        if active or queued:
+            self.download_stats_label.setText(
+                f"下载: {active} 个进行中，{queued} 个排队，总速度 {format_size(speed)}/s")
+        else:
+            self.download_stats_label.setText("下载: 无进行中的任务")
+
+    def open_download(self, item, column):
+        path = item.data(0, Qt.ItemDataRole.UserRole)
+        if path and os.path.exists(path):
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
     def copy_to_clipboard(self, text, button):
         clipboard = QApplication.clipboard()
         clipboard.setText(text)
@@ -1466,7 +5031,13 @@ class CrawlerPage(QWidget):
         self.clear_results()
         self.show_status(f"开始爬取: {url}")
 
-        self.crawler_thread = CrawlerThread(url, self.parent.browser, self.parent.browser_path)
+        self.crawler_thread = CrawlerThread(url, self.parent.browser, self.parent.browser_path,
+                                            max_depth=self.depth_spin.value(),
+                                            max_pages=self.max_pages_spin.value(),
+                                            same_domain=self.same_domain_check.isChecked(),
+                                            scope_pattern=self.scope_input.text().strip() or None,
+                                            per_host_limit=self.host_limit_spin.value(),
+                                            delay=self.delay_spin.value() / 1000)
         # 确保正确连接信号
         self.crawler_thread.update_signal.connect(self.update_ui)
         self.crawler_thread.status_signal.connect(self.show_status)
@@ -1478,6 +5049,8 @@ class CrawlerPage(QWidget):
         self.stop_button.setEnabled(True)
 
     def clear_results(self):
+        self.cancel_previews()
+        self.media_urls = []
         while self.scroll_layout.count():
             child = self.scroll_layout.takeAt(0)
             if child.widget():
@@ -1494,6 +5067,7 @@ class CrawlerPage(QWidget):
         if self.crawler_thread and self.crawler_thread.isRunning():
             self.crawler_thread.requestInterruption()
             self.crawler_thread.wait()
+            self.cancel_previews()
             self.show_status("爬取已停止")
             self.stop_button.setEnabled(False)
             self.crawl_button.setEnabled(True)
@@ -1538,6 +5112,82 @@ class SettingsPage(QWidget):
         self.directory_button.clicked.connect(self.choose_directory)
         layout.addRow("下载目录:", self.directory_button)
 
+        self.scan_workers_spin = QSpinBox()
+        self.scan_workers_spin.setRange(1, 64)
+        self.scan_workers_spin.setToolTip("并行列出目录的线程数，机械硬盘建议调低，NVMe和网络盘可以调高")
+        self.scan_workers_spin.setStyleSheet("""
+            background-color: #1e1e1e;
+            color: white;
+            padding: 5px;
+            border: 1px solid #333;
+            border-radius: 4px;
+        """)
+        self.scan_workers_spin.setValue(getattr(self.parent, 'scan_workers', ParallelWalker.default_workers))
+        layout.addRow("扫描线程数:", self.scan_workers_spin)
+
+        # 扫描根目录及其预算，空白表示不限制
+        self.roots_tree = QTreeWidget()
+        self.roots_tree.setHeaderLabels(["目录", "最大深度", "最多文件数", "时间预算(秒)"])
+        self.roots_tree.setRootIsDecorated(False)
+        self.roots_tree.setMaximumHeight(150)
+        self.roots_tree.setToolTip("双击单元格修改预算，留空表示不限制；修改后重建索引生效")
+        self.roots_tree.setStyleSheet("""
+            background-color: #1e1e1e;
+            color: white;
+            border: 1px solid #333;
+        """)
+        for root in get_file_index().roots:
+            self.add_root_item(root)
+        layout.addRow("扫描目录:", self.roots_tree)
+
+        roots_buttons = QHBoxLayout()
+        self.add_root_button = QPushButton("添加目录")
+        self.add_root_button.clicked.connect(self.choose_scan_root)
+        roots_buttons.addWidget(self.add_root_button)
+        self.remove_root_button = QPushButton("移除选中目录")
+        self.remove_root_button.clicked.connect(self.remove_scan_root)
+        roots_buttons.addWidget(self.remove_root_button)
+        for button in (self.add_root_button, self.remove_root_button):
+            button.setStyleSheet("""
+                background-color: #2196F3;
+                color: white;
+                padding: 5px 15px;
+                border: none;
+                border-radius: 4px;
+            """)
+        layout.addRow("", roots_buttons)
+
+        exclusions = get_file_index().exclusions or ScanExclusions()
+        input_style = """
+            background-color: #1e1e1e;
+            color: white;
+            padding: 5px;
+            border: 1px solid #333;
+            border-radius: 4px;
+        """
+        self.exclude_patterns_input = QLineEdit('; '.join(exclusions.patterns))
+        self.exclude_patterns_input.setToolTip("用分号分隔的通配符模式；不含路径分隔符的匹配目录名，含分隔符的匹配完整路径")
+        self.exclude_patterns_input.setStyleSheet(input_style)
+        layout.addRow("排除目录:", self.exclude_patterns_input)
+
+        self.exclude_fs_input = QLineEdit(', '.join(exclusions.fs_types))
+        self.exclude_fs_input.setToolTip("用逗号分隔的文件系统类型，挂载在这些文件系统上的目录不扫描（仅Linux）")
+        self.exclude_fs_input.setStyleSheet(input_style)
+        layout.addRow("排除文件系统:", self.exclude_fs_input)
+
+        self.same_device_check = QCheckBox("只扫描根目录所在的设备（不进入其他挂载点）")
+        self.same_device_check.setChecked(exclusions.same_device)
+        layout.addRow("", self.same_device_check)
+
+        self.skip_hidden_check = QCheckBox("跳过隐藏目录")
+        self.skip_hidden_check.setChecked(exclusions.skip_hidden)
+        layout.addRow("", self.skip_hidden_check)
+
+        self.prune_stats_label = QLabel()
+        self.prune_stats_label.setWordWrap(True)
+        self.prune_stats_label.setStyleSheet("color: #2196F3;")
+        layout.addRow("上次扫描排除:", self.prune_stats_label)
+
         # 添加说明标签
         browser_note = QLabel("注意: 爬虫功能已优化为不需要浏览器，以下设置仅供参考")
         browser_note.setStyleSheet("color: #FFA500;")  # 橙色警告
@@ -1619,6 +5269,11 @@ class SettingsPage(QWidget):
         self.show_current_settings()
 
     def show_current_settings(self):
+        try:
+            stats = json.loads(get_file_index().get_meta('prune_stats', '[]'))
+        except (ValueError, sqlite3.Error):
+            stats = []
+        self.prune_stats_label.setText('；'.join(f"{rule}: {count} 个目录" for rule, count in stats) or "无")
         if hasattr(self.parent, 'download_directory'):
             self.directory_button.setToolTip(f"当前下载目录: {self.parent.download_directory}")
         if hasattr(self.parent, 'theme_color'):
@@ -1639,6 +5294,33 @@ class SettingsPage(QWidget):
             self.parent.download_directory = directory
             self.show_current_settings()
 
+    def add_root_item(self, root):
+        limits = [root.max_depth, root.max_files, root.time_budget]
+        item = QTreeWidgetItem([root.path] + ['' if value is None else str(value) for value in limits])
+        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsEditable)
+        self.roots_tree.addTopLevelItem(item)
+
+    def choose_scan_root(self):
+        directory = QFileDialog.getExistingDirectory(self, "选择扫描目录")
+        if directory:
+            self.add_root_item(ScanRoot(directory))
+
+    def remove_scan_root(self):
+        for item in self.roots_tree.selectedItems():
+            self.roots_tree.takeTopLevelItem(self.roots_tree.indexOfTopLevelItem(item))
+
+    def read_scan_roots(self):
+        """读取表格中的根目录，预算无法解析为正数时视为不限制"""
+        parse = ScanRoot.parse_budget
+        roots = []
+        for i in range(self.roots_tree.topLevelItemCount()):
+            item = self.roots_tree.topLevelItem(i)
+            path = item.text(0).strip()
+            if path:
+                roots.append(ScanRoot(path, parse(item.text(1), int), parse(item.text(2), int),
+                                      parse(item.text(3), float)))
+        return roots
+
     def choose_background(self):
         file_name, _ = QFileDialog.getOpenFileName(
             self,
@@ -1702,6 +5384,17 @@ class SettingsPage(QWidget):
     def save_settings(self):
         self.parent.browser = self.browser_combo.currentText()
         self.parent.browser_path = self.browser_path_input.text() if self.browser_path_input.text() else None
+        self.parent.scan_workers = self.scan_workers_spin.value()
+        get_file_index().workers = self.parent.scan_workers
+        exclusions = ScanExclusions(
+            [p.strip() for p in self.exclude_patterns_input.text().split(';') if p.strip()],
+            [t.strip() for t in re.split(r'[,\s]+', self.exclude_fs_input.text()) if t.strip()],
+            self.same_device_check.isChecked(), self.skip_hidden_check.isChecked())
+        self.parent.scan_exclusions = exclusions.to_settings()
+        get_file_index().exclusions = exclusions
+        roots = self.read_scan_roots() or default_scan_roots()
+        self.parent.scan_roots = [root.to_settings() for root in roots]
+        get_file_index().roots = roots
         self.parent.save_settings()
         QMessageBox.information(self, "成功", "设置已保存")
         self.show_current_settings()
@@ -1739,8 +5432,24 @@ class MainWindow(QMainWindow):
         self.stacked_widget.addWidget(self.settings_page)
         main_layout.addWidget(self.stacked_widget)
 
+        # 文件监视线程，让媒体和文档页面无需重新扫描即可保持最新
+        scan_coordinator = get_scan_coordinator()
+        self.file_watcher = FileWatcher()
+        self.file_watcher.files_found.connect(scan_coordinator.files_found)
+        self.file_watcher.files_removed.connect(scan_coordinator.files_removed)
+        self.file_watcher.start()
+
         self.apply_theme()
 
+    def closeEvent(self, event):
+        get_scan_coordinator().stop()
+        self.file_watcher.requestInterruption()
+        self.file_watcher.wait()
+        self.crawler_page.preview_fetcher.shutdown()
+        self.document_page.stop_content_indexer()
+        get_download_manager().shutdown()
+        super().closeEvent(event)
+
     def force_refresh_theme(self):
         """强制刷新主题，确保背景图片正确显示"""
         # 保存当前背景图片路径
@@ -1760,19 +5469,22 @@ class MainWindow(QMainWindow):
     def switch_page(self, index):
         self.stacked_widget.setCurrentIndex(index)
         if index == 3:  # Media page
-            self.media_page.start_scan()
+            self.media_page.ensure_scanned()
         elif index == 2:  # Document page
-            self.document_page.start_scan()
+            self.document_page.ensure_scanned()
         elif index == 0:  # Crawler page
             self.crawler_page.clear_results()
 
     def download_file(self, url):
-        file_name = os.path.join(self.download_directory, url.split('/')[-1])
         try:
-            urllib.request.urlretrieve(url, file_name)
-            self.show_status(f"文件已下载到: {file_name}")
-        except Exception as e:
+            task_id = get_download_manager().download(url, self.download_directory)
+        except OSError as e:
             self.show_status(f"下载失败: {str(e)}")
+            return
+        if task_id is None:
+            self.show_status(f"已在下载列表中: {url}")
+        else:
+            self.show_status(f"已加入下载队列: {url}")
 
     def apply_theme(self):
         darker_color = QColor(
@@ -1848,12 +5560,34 @@ class MainWindow(QMainWindow):
                     self.browser = settings.get('browser', 'Chrome')
                     self.browser_path = settings.get('browser_path', None)
                     self.background_image = settings.get('background_image', None)
+                    self.scan_workers = settings.get('scan_workers', ParallelWalker.default_workers)
+                    self.thumbnail_cache_mb = settings.get('thumbnail_cache_mb', ThumbnailDiskCache.default_budget_mb)
+                    self.pixmap_cache_mb = settings.get('pixmap_cache_mb', PixmapCache.default_limit_mb)
+                    self.http_cache_mb = settings.get('http_cache_mb', HttpCache.default_budget_mb)
+                    self.max_downloads = settings.get('max_downloads', DownloadManager.default_workers)
+                    self.download_dedup = settings.get('download_dedup', DownloadManager.dedup_mode)
+                    self.scan_exclusions = settings.get('scan_exclusions', ScanExclusions().to_settings())
+                    self.scan_roots = settings.get('scan_roots') or [root.to_settings() for root in default_scan_roots()]
             else:
                 self.theme_color = QColor(240, 240, 240)
                 self.download_directory = os.path.expanduser("~/Downloads")
                 self.browser = 'Chrome'
                 self.browser_path = None
                 self.background_image = None
+                self.scan_workers = ParallelWalker.default_workers
+                self.thumbnail_cache_mb = ThumbnailDiskCache.default_budget_mb
+                self.pixmap_cache_mb = PixmapCache.default_limit_mb
+                self.http_cache_mb = HttpCache.default_budget_mb
+                self.max_downloads = DownloadManager.default_workers
+                self.download_dedup = DownloadManager.dedup_mode
+                self.scan_exclusions = ScanExclusions().to_settings()
+                self.scan_roots = [root.to_settings() for root in default_scan_roots()]
+            # 手工编辑过的扫描设置可能缺路径或类型不对：跳过无效的根目录，无法解析的预算视为不限制
+            scan_roots = ([ScanRoot.from_settings(item) for item in self.scan_roots]
+                          if isinstance(self.scan_roots, list) else [])
+            self.scan_roots = ([root.to_settings() for root in scan_roots if root]
+                               or [root.to_settings() for root in default_scan_roots()])
+            self.scan_exclusions = ScanExclusions.from_settings(self.scan_exclusions).to_settings()
         except Exception as e:
             print(f"加载设置时出错: {str(e)}")
             # 使用默认设置
@@ -1862,6 +5596,22 @@ class MainWindow(QMainWindow):
             self.browser = 'Chrome'
             self.browser_path = None
             self.background_image = None
+            self.scan_workers = ParallelWalker.default_workers
+            self.thumbnail_cache_mb = ThumbnailDiskCache.default_budget_mb
+            self.pixmap_cache_mb = PixmapCache.default_limit_mb
+            self.http_cache_mb = HttpCache.default_budget_mb
+            self.max_downloads = DownloadManager.default_workers
+            self.download_dedup = DownloadManager.dedup_mode
+            self.scan_exclusions = ScanExclusions().to_settings()
+            self.scan_roots = [root.to_settings() for root in default_scan_roots()]
+        get_file_index().workers = self.scan_workers
+        get_file_index().exclusions = ScanExclusions.from_settings(self.scan_exclusions)
+        get_file_index().roots = [ScanRoot.from_settings(item) for item in self.scan_roots]
+        get_thumbnail_disk_cache().budget_bytes = self.thumbnail_cache_mb * 1024 * 1024
+        get_pixmap_cache().set_limit(self.pixmap_cache_mb * 1024 * 1024)
+        get_http_cache().budget_bytes = self.http_cache_mb * 1024 * 1024
+        get_download_manager().set_max_workers(self.max_downloads)
+        get_download_manager().dedup_mode = self.download_dedup
 
     def save_settings(self):
         try:
@@ -1870,7 +5620,15 @@ class MainWindow(QMainWindow):
                 'download_directory': self.download_directory,
                 'browser': self.browser,
                 'browser_path': self.browser_path,
-                'background_image': self.background_image
+                'background_image': self.background_image,
+                'scan_workers': self.scan_workers,
+                'thumbnail_cache_mb': self.thumbnail_cache_mb,
+                'pixmap_cache_mb': self.pixmap_cache_mb,
+                'http_cache_mb': self.http_cache_mb,
+                'max_downloads': self.max_downloads,
+                'download_dedup': self.download_dedup,
+                'scan_exclusions': self.scan_exclusions,
+                'scan_roots': self.scan_roots
             }
 
             settings_path = get_settings_path()
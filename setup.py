@@ -3,7 +3,7 @@ import os
 from cx_Freeze import setup, Executable
 
 # 依赖包
-packages = ["os", "sys", "PyQt6", "requests", "bs4", "urllib", "json", "subprocess"]
+packages = ["os", "sys", "PyQt6", "requests", "html", "urllib", "json", "subprocess", "sqlite3"]
 
 # 需要包含的文件
 include_files = []
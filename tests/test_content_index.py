@@ -0,0 +1,31 @@
+import pytest
+
+main = pytest.importorskip("main")
+
+
+@pytest.fixture
+def index(tmp_path):
+    content_index = main.ContentIndex(str(tmp_path / "content_index.db"))
+    content_index.update(("/docs/a.docx", "a.docx", ".docx", 1, 1.0, "/docs"),
+                         "他说：人世。人世间 我们使用Python编程 版本2024年")
+    content_index.commit()
+    return content_index
+
+
+@pytest.mark.parametrize("query", ["人世", "人世间", "Python", "pyth*"])
+def test_words_and_phrases(index, query):
+    assert [path for _name, path, _score in index.search(query)] == ["/docs/a.docx"]
+
+
+@pytest.mark.parametrize("query", ["使用Python", "版本2024年", "2024年"])
+def test_mixed_script_words(index, query):
+    assert [path for _name, path, _score in index.search(query)] == ["/docs/a.docx"]
+
+
+@pytest.mark.parametrize("query", ["人", "世", "间", "程", "年"])
+def test_single_characters_including_run_ends(index, query):
+    assert [path for _name, path, _score in index.search(query)] == ["/docs/a.docx"]
+
+
+def test_non_adjacent_characters_do_not_match(index):
+    assert index.search("他说人") == []
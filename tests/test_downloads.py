@@ -0,0 +1,114 @@
+import http.server
+import os
+import threading
+
+import pytest
+
+main = pytest.importorskip("main")
+
+DATA = os.urandom(3 * 1024 * 1024)
+
+
+class RangeHandler(http.server.BaseHTTPRequestHandler):
+    """支持Range和If-Range的最小静态文件服务器，记录每个GET请求的Range头"""
+    accept_ranges = True
+    etag = '"v1"'
+    requests_seen = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_body_headers(self, length):
+        self.send_header('ETag', self.etag)
+        if self.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_body_headers(len(DATA))
+
+    def do_GET(self):
+        requested = self.headers.get('Range')
+        self.requests_seen.append(requested)
+        if requested and self.accept_ranges and self.headers.get('If-Range') in (None, self.etag):
+            start, end = requested.split('=', 1)[1].split('-')
+            start, end = int(start), int(end) if end else len(DATA) - 1
+            body = DATA[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(DATA)}')
+        else:
+            body = DATA
+            self.send_response(200)
+        self.send_body_headers(len(body))
+        self.wfile.write(body)
+
+
+def serve(accept_ranges):
+    handler = type('Handler', (RangeHandler,), {'accept_ranges': accept_ranges, 'requests_seen': []})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, '_content_store', main.ContentStore(main.FileIndex(str(tmp_path / 'index.db'))))
+    manager = main.DownloadManager(workers=1)
+    manager.segment_threshold = 1024 * 1024
+    manager.min_segment_size = 512 * 1024
+    manager.max_retries = 0
+    manager.finished = []
+    manager.task_finished.connect(lambda task_id, ok, message: manager.finished.append((task_id, ok, message)))
+    yield manager
+    manager.session.close()
+
+
+@pytest.fixture
+def ranged_server():
+    server, handler = serve(accept_ranges=True)
+    yield server, handler
+    server.shutdown()
+
+
+def run_task(manager, task_id, url, path):
+    # 直接在当前线程运行任务，信号同步送达
+    main.DownloadTask(manager, task_id, url, str(path)).run()
+    return manager.finished[-1]
+
+
+def url_for(server, name):
+    return f'http://127.0.0.1:{server.server_address[1]}/{name}'
+
+
+def test_segmented_download(manager, ranged_server, tmp_path):
+    server, handler = ranged_server
+    path = tmp_path / 'file.bin'
+    assert run_task(manager, 1, url_for(server, 'file.bin'), path) == (1, True, '完成')
+    assert path.read_bytes() == DATA
+    assert len(handler.requests_seen) == manager.max_segments
+    assert all(requested and requested.startswith('bytes=') for requested in handler.requests_seen)
+    assert not os.path.exists(f'{path}.part') and not os.path.exists(f'{path}.part.json')
+
+
+def test_falls_back_to_single_stream_without_accept_ranges(manager, tmp_path):
+    server, handler = serve(accept_ranges=False)
+    try:
+        path = tmp_path / 'file.bin'
+        assert run_task(manager, 1, url_for(server, 'file.bin'), path) == (1, True, '完成')
+    finally:
+        server.shutdown()
+    assert path.read_bytes() == DATA
+    assert handler.requests_seen == [None]
+
+
+def test_identical_content_is_hardlinked(manager, ranged_server, tmp_path):
+    server, handler = ranged_server
+    first, second = tmp_path / 'a.bin', tmp_path / 'b.bin'
+    deduplicated = []
+    manager.task_deduplicated.connect(lambda task_id, existing: deduplicated.append((task_id, existing)))
+    assert run_task(manager, 1, url_for(server, 'a.bin'), first)[1]
+    assert run_task(manager, 2, url_for(server, 'b.bin'), second) == (2, True, '重复文件，已硬链接')
+    assert os.path.samefile(first, second)
+    assert deduplicated == [(2, str(first))]
@@ -0,0 +1,44 @@
+import os
+import time
+
+import pytest
+
+main = pytest.importorskip("main")
+
+
+@pytest.fixture
+def index(tmp_path):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "a.jpg").write_bytes(b"a")
+    file_index = main.FileIndex(str(tmp_path / "file_index.db"))
+    file_index.roots = [main.ScanRoot(str(root))]
+    file_index.build(file_index.roots)
+    return file_index, root
+
+
+def touch_directory(root):
+    # 目录mtime精度有限，先等一会儿再改动
+    time.sleep(0.05)
+    later = time.time() + 10
+    os.utime(root, (later, later))
+
+
+def test_refresh_of_unchanged_listing_keeps_name_index(index):
+    file_index, root = index
+    changes = file_index.changes
+    touch_directory(root)
+    assert file_index.refresh(file_index.roots) == ([], [])
+    assert file_index.changes == changes
+
+
+def test_refresh_records_added_and_removed_files(index):
+    file_index, root = index
+    changes = file_index.changes
+    (root / "a.jpg").unlink()
+    (root / "b.pdf").write_bytes(b"b")
+    touch_directory(root)
+    added, removed = file_index.refresh(file_index.roots)
+    assert [row[1] for row in added] == ["b.pdf"]
+    assert removed == [str(root / "a.jpg")]
+    assert file_index.changes > changes
@@ -0,0 +1,25 @@
+import pytest
+
+main = pytest.importorskip("main")
+
+
+def test_scan_root_skips_entries_without_path():
+    assert main.ScanRoot.from_settings({'max_depth': 3}) is None
+    assert main.ScanRoot.from_settings({'path': 42}) is None
+    assert main.ScanRoot.from_settings(['/tmp']) is None
+    assert main.ScanRoot.from_settings('  ') is None
+
+
+def test_scan_root_coerces_budgets():
+    root = main.ScanRoot.from_settings({'path': '/tmp', 'max_depth': '3', 'max_files': 'many',
+                                        'time_budget': -1})
+    assert (root.max_depth, root.max_files, root.time_budget) == (3, None, None)
+    assert root.allows_children(2) and not root.allows_children(3)
+
+
+def test_scan_exclusions_ignore_wrong_types():
+    exclusions = main.ScanExclusions.from_settings({'patterns': 'node_modules', 'fs_types': ['proc', 5],
+                                                    'same_device': 'yes'})
+    assert exclusions.patterns == main.ScanExclusions.default_patterns
+    assert exclusions.fs_types == ['proc']
+    assert exclusions.same_device is False